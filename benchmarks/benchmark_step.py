@@ -0,0 +1,179 @@
+"""Замер скорости построения модели и шагов по фазам для разных размеров населения.
+
+--scaling сравнивает по фазам векторный движок с объектным на растущем населении
+(по умолчанию 10000 и 40000) и завершается с кодом 1, если векторный шаг где-то медленнее.
+--settings переопределяет параметры settings.py, например частое строительство
+'{"BUILD_SPEED": 1}', при котором покупок за шаг больше всего.
+
+Пример:
+    python benchmarks/benchmark_step.py --sizes 1000 10000 --steps 12 --output bench.json
+    python benchmarks/benchmark_step.py --compare old.json new.json
+    python benchmarks/benchmark_step.py --scaling --settings '{"BUILD_SPEED": 1}'
+"""
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from warnings import filterwarnings
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))  # Для импорта custom_module
+
+ENGINES = ("object", "vector", "simple")
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+SCALING_SIZES = (10000, 40000)
+
+
+def model_factory(engine, settings=None):
+    # Импорт пакета - до замера, чтобы его разовое время не попадало в init_seconds.
+    # Возвращает функцию (num_buyers, seed, profiler) -> модель. settings у simple_market_model нет
+    if engine == "simple":
+        from custom_module.simple_market_model.world import WorldModel
+        return lambda num_buyers, seed, profiler: WorldModel(n=num_buyers, seed=seed)
+    from custom_module.market_and_cycle_model.config import make_config
+    from custom_module.market_and_cycle_model.scenario import create_model
+    config = make_config(settings)
+    return lambda num_buyers, seed, profiler: create_model(
+        num_buyers=num_buyers, seed=seed, engine=engine, profiler=profiler, config=config)
+
+
+def run_case(engine, num_buyers, steps, seed, settings=None):
+    # Выполняется в отдельном процессе, чтобы пик памяти относился только к этому замеру
+    from custom_module.market_and_cycle_model.profiling import StepProfiler
+    filterwarnings("ignore")
+    create_model = model_factory(engine, settings)
+    profiler = StepProfiler()
+    started = time.perf_counter()
+    model = create_model(num_buyers, seed, profiler)
+    init_seconds = time.perf_counter() - started
+
+    # Шаги идут через model.step(), как в обычных прогонах; фазы замеряет StepProfiler.
+    # У simple_market_model фаз нет, замеряется шаг целиком
+    step_seconds = []
+    for _ in range(steps):
+        step_started = time.perf_counter()
+        model.step()
+        step_seconds.append(time.perf_counter() - step_started)
+    if profiler.rows:
+        phases = profiler.get_step_dataframe().filter(like="_seconds").drop(columns="step_seconds")
+        phase_seconds = {column[:-len("_seconds")]: total for column, total in phases.sum().items()}
+    else:
+        phase_seconds = {"step": sum(step_seconds)}
+
+    return {
+        "engine": engine,
+        "num_buyers": num_buyers,
+        "steps": steps,
+        "init_seconds": init_seconds,
+        "step_seconds_mean": sum(step_seconds) / steps,
+        "step_seconds_max": max(step_seconds),
+        "phase_seconds_mean": {phase: total / steps for phase, total in phase_seconds.items()},
+        # ru_maxrss в килобайтах на Linux и в байтах на macOS
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024**2 if sys.platform == "darwin" else 1024),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(engines=ENGINES, sizes=DEFAULT_SIZES, steps=12, seed=0, settings=None):
+    import mesa
+    import numpy as np
+    results = []
+    for engine in engines:
+        for num_buyers in sizes:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                result = pool.submit(run_case, engine, num_buyers, steps, seed, settings).result()
+            print("{engine:>7} {num_buyers:>8}: init {init_seconds:8.2f}s, step {step_seconds_mean:8.3f}s, "
+                  "peak {peak_rss_mb:8.0f} MB".format(**result), flush=True)
+            results.append(result)
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "mesa": mesa.__version__,
+        "machine": platform.machine(),
+        "settings": settings or {},
+        "results": results,
+    }
+
+
+def compare(old, new):
+    # Отношение новое/старое для общих замеров: > 1 значит, что стало медленнее
+    old_results = {(r["engine"], r["num_buyers"]): r for r in old["results"]}
+    print("{:>7} {:>8} {:>10} {:>10} {:>10}".format("engine", "buyers", "init", "step", "memory"))
+    for result in new["results"]:
+        key = (result["engine"], result["num_buyers"])
+        if key not in old_results:
+            continue
+        before = old_results[key]
+        print("{:>7} {:>8} {:>9.2f}x {:>9.2f}x {:>9.2f}x".format(
+            *key,
+            result["init_seconds"] / before["init_seconds"],
+            result["step_seconds_mean"] / before["step_seconds_mean"],
+            result["peak_rss_mb"] / before["peak_rss_mb"]))
+
+
+def scaling(report, reference="object", candidate="vector"):
+    # Ускорение candidate относительно reference (время reference / время candidate) по фазам
+    # для каждого размера населения. Возвращает True, если шаг candidate быстрее на всех размерах
+    results = {(r["engine"], r["num_buyers"]): r for r in report["results"]}
+    sizes = sorted(n for engine, n in results if engine == reference and (candidate, n) in results)
+    phases = list(results[(reference, sizes[0])]["phase_seconds_mean"])
+    print("{:>24}".format("phase") + "".join("{:>10}".format(n) for n in sizes))
+    for phase in phases + ["step"]:
+        ratios = []
+        for n in sizes:
+            before, after = results[(reference, n)], results[(candidate, n)]
+            if phase == "step":
+                ratios.append(before["step_seconds_mean"] / after["step_seconds_mean"])
+            else:
+                ratios.append(before["phase_seconds_mean"][phase] / after["phase_seconds_mean"][phase])
+        print("{:>24}".format(phase) + "".join("{:>9.2f}x".format(ratio) for ratio in ratios))
+    faster = all(
+        results[(candidate, n)]["step_seconds_mean"] < results[(reference, n)]["step_seconds_mean"] for n in sizes)
+    print("{} is {} than {} at every size".format(candidate, "faster" if faster else "NOT faster", reference))
+    return faster
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=ENGINES)
+    parser.add_argument("--sizes", nargs="+", type=int)
+    parser.add_argument("--steps", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file for the results")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    parser.add_argument("--scaling", action="store_true", help="per-phase speedup of vector over object by size")
+    parser.add_argument("--settings", type=json.loads, help="JSON overrides of settings.py")
+    args = parser.parse_args()
+
+    if args.compare:
+        old, new = (json.loads(Path(path).read_text()) for path in args.compare)
+        compare(old, new)
+        return
+    if args.scaling:
+        report = run_benchmarks(
+            ("object", "vector"), args.sizes or SCALING_SIZES, args.steps, args.seed, args.settings)
+    else:
+        report = run_benchmarks(args.engines, args.sizes or DEFAULT_SIZES, args.steps, args.seed, args.settings)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    if args.scaling and not scaling(report):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Проверка, что быстрая реализация модели воспроизводит динамику эталонной, и её ускорение.
+
+Эталон и кандидат считаются на одних и тех же зёрнах и сценарии. Если все ряды показателей
+совпадают побитово - вердикт identical. Иначе ряды сравниваются статистически после прогрева:
+для ключевых показателей - тест Колмогорова-Смирнова по значениям всех зёрен раз в thin месяцев,
+t-тест Уэлча по средним каждого зерна и относительная разница средних; для богатства -
+квантили распределения богатства всех покупателей в последний месяц. Все проверки прошли -
+equivalent, иначе different (код выхода 1).
+
+simple - маленькая детерминированная модель simple_market_model: прогон с ней против самой себя
+должен дать identical и проверяет сам стенд.
+
+Пример:
+    python benchmarks/compare_engines.py --reference object --candidate vector --seeds 0 1 2 3 4 5 6 7
+    python benchmarks/compare_engines.py --candidate vector-batch --scenario govhelp --output report.json
+    python benchmarks/compare_engines.py --reference simple --candidate simple --num-buyers 100 --months 50
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from warnings import filterwarnings
+
+import numpy as np
+from scipy import stats
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))  # Для импорта custom_module
+
+# Реализация -> (семейство моделей, параметры). Сравнивать можно только модели одного семейства
+MODELS = {
+    "object": ("market", {"engine": "object"}),
+    "vector": ("market", {"engine": "vector"}),
+    "object-batch": ("market", {"engine": "object", "policy": {"market_clearing": "batch"}}),
+    "vector-batch": ("market", {"engine": "vector", "policy": {"market_clearing": "batch"}}),
+    "simple": ("simple", {}),
+}
+# Показатели, распределения которых проверяются тестами
+KEY_METRICS = {
+    "market": ("sold_price", "hai", "pir", "population"),
+    "simple": ("price", "homes", "demand"),
+}
+WEALTH_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+def run_market(settings, seed, months, num_buyers, scenario):
+    from custom_module.market_and_cycle_model.scenario import BASE_POLICY, SCENARIOS, create_model, run_model
+    model = create_model(
+        num_buyers=num_buyers, seed=seed, policy={**BASE_POLICY, **settings.get("policy", {})},
+        engine=settings["engine"])
+    run_model(model, months, SCENARIOS[scenario])
+    return model.datacollector.get_model_vars_dataframe(), np.array(model.get_buyer_wealth(), dtype=float)
+
+
+def run_simple(settings, seed, months, num_buyers, scenario):
+    # Агенты simple_market_model берут случайные числа из глобального np.random
+    from custom_module.simple_market_model.agents import Buyer
+    from custom_module.simple_market_model.world import WorldModel
+    np.random.seed(seed)
+    model = WorldModel(n=num_buyers, seed=seed)
+    for _ in range(months):
+        model.step()
+    wealth = np.array([buyer.wealth for buyer in model.agents_by_type[Buyer]], dtype=float)
+    return model.datacollector.get_model_vars_dataframe().astype(float), wealth
+
+
+RUNNERS = {"market": run_market, "simple": run_simple}
+
+
+def run_model_timed(name, seed, months, num_buyers, scenario):
+    family, settings = MODELS[name]
+    started = time.perf_counter()
+    metrics, wealth = RUNNERS[family](settings, seed, months, num_buyers, scenario)
+    return metrics, wealth, time.perf_counter() - started
+
+
+def p_value(test, reference, candidate):
+    # Совпадающие выборки (в том числе постоянные ряды, где тест не определён) считаются неразличимыми
+    if len(reference) == 0 or len(candidate) == 0 or np.array_equal(reference, candidate):
+        return 1.0
+    result = test(reference, candidate).pvalue
+    return 1.0 if np.isnan(result) else float(result)
+
+
+def compare_metric(reference, candidate, burn_in, thin, alpha, rtol, key):
+    # reference, candidate - массивы зерно x месяц одного показателя. Соседние месяцы сильно
+    # зависимы, и KS по всем месяцам находит различия в доли процента: берётся каждый thin-й месяц
+    reference, candidate = reference[:, burn_in:], candidate[:, burn_in:]
+    reference_mean, candidate_mean = np.nanmean(reference), np.nanmean(candidate)
+    difference = abs(candidate_mean - reference_mean) / max(abs(reference_mean), 1e-12)
+    row = {
+        "reference_mean": float(reference_mean),
+        "candidate_mean": float(candidate_mean),
+        "relative_difference": float(difference),
+    }
+    if key:
+        pooled_reference, pooled_candidate = reference[:, ::thin], candidate[:, ::thin]
+        pooled_reference = pooled_reference[np.isfinite(pooled_reference)]
+        pooled_candidate = pooled_candidate[np.isfinite(pooled_candidate)]
+        row["ks_pvalue"] = p_value(stats.ks_2samp, pooled_reference, pooled_candidate)
+        row["welch_pvalue"] = p_value(
+            lambda a, b: stats.ttest_ind(a, b, equal_var=False),
+            np.nanmean(reference, axis=1), np.nanmean(candidate, axis=1))
+        row["passed"] = bool(difference <= rtol and row["ks_pvalue"] >= alpha and row["welch_pvalue"] >= alpha)
+    return row
+
+
+def compare_wealth(reference, candidate, rtol):
+    # Квантили богатства всех покупателей всех зёрен в последний месяц. Богатство бывает
+    # отрицательным, поэтому разница квантилей отнесена к межквартильному размаху эталона
+    reference, candidate = np.concatenate(reference), np.concatenate(candidate)
+    spread = max(np.subtract(*np.quantile(reference, [0.75, 0.25])), 1e-12)
+    rows = {}
+    for quantile in WEALTH_QUANTILES:
+        reference_value, candidate_value = np.quantile(reference, quantile), np.quantile(candidate, quantile)
+        difference = abs(candidate_value - reference_value) / spread
+        rows["q{:g}".format(quantile)] = {
+            "reference": float(reference_value),
+            "candidate": float(candidate_value),
+            "difference_to_iqr": float(difference),
+            "passed": bool(difference <= rtol),
+        }
+    return rows
+
+
+def compare_engines(reference="object", candidate="vector", seeds=range(8), months=200, num_buyers=2000,
+                    scenario="base", burn_in=24, thin=12, alpha=0.01, rtol=0.05):
+    family = MODELS[reference][0]
+    if MODELS[candidate][0] != family:
+        raise ValueError('{} and {} are different models'.format(reference, candidate))
+    runs = {name: [run_model_timed(name, seed, months, num_buyers, scenario) for seed in seeds]
+            for name in (reference, candidate)}
+    identical = all(
+        reference_metrics.equals(candidate_metrics) and np.array_equal(reference_wealth, candidate_wealth)
+        for (reference_metrics, reference_wealth, _), (candidate_metrics, candidate_wealth, _)
+        in zip(runs[reference], runs[candidate]))
+
+    metrics = {}
+    for metric in runs[reference][0][0].columns:
+        series = {
+            name: np.array([run[0][metric].to_numpy(dtype=float) for run in runs[name]])
+            for name in (reference, candidate)}
+        metrics[metric] = compare_metric(
+            series[reference], series[candidate], burn_in, thin, alpha, rtol, metric in KEY_METRICS[family])
+    wealth = compare_wealth([run[1] for run in runs[reference]], [run[1] for run in runs[candidate]], rtol)
+
+    failed = [name for name, row in metrics.items() if not row.get("passed", True)]
+    failed += ["wealth_" + name for name, row in wealth.items() if not row["passed"]]
+    if identical:
+        verdict = "identical"
+    else:
+        verdict = "different" if failed else "equivalent"
+    seconds = {name: sum(run[2] for run in runs[name]) for name in (reference, candidate)}
+    return {
+        "reference": reference,
+        "candidate": candidate,
+        "seeds": list(seeds),
+        "months": months,
+        "num_buyers": num_buyers,
+        "scenario": scenario,
+        "burn_in": burn_in,
+        "thin": thin,
+        "alpha": alpha,
+        "rtol": rtol,
+        "verdict": verdict,
+        "failed": failed,
+        "reference_seconds": seconds[reference],
+        "candidate_seconds": seconds[candidate],
+        "speedup": seconds[reference] / seconds[candidate],
+        "metrics": metrics,
+        "wealth_quantiles": wealth,
+    }
+
+
+def print_report(report):
+    print("{:>20} {:>14} {:>14} {:>9} {:>9} {:>9}".format(
+        "metric", "reference", "candidate", "rel.diff", "KS p", "Welch p"))
+    for name, row in report["metrics"].items():
+        if "passed" not in row:
+            continue
+        print("{:>20} {:>14.6g} {:>14.6g} {:>9.4f} {:>9.4f} {:>9.4f} {}".format(
+            name, row["reference_mean"], row["candidate_mean"], row["relative_difference"],
+            row["ks_pvalue"], row["welch_pvalue"], "ok" if row["passed"] else "FAIL"))
+    for name, row in report["wealth_quantiles"].items():
+        print("{:>20} {:>14.6g} {:>14.6g} {:>9.4f} {:>9} {:>9} {}".format(
+            "wealth " + name, row["reference"], row["candidate"], row["difference_to_iqr"], "", "",
+            "ok" if row["passed"] else "FAIL"))
+    print("{candidate} vs {reference}: {verdict}, speedup {speedup:.2f}x "
+          "({reference_seconds:.1f}s -> {candidate_seconds:.1f}s)".format(**report))
+    if report["failed"]:
+        print("failed checks: " + ", ".join(report["failed"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reference", choices=MODELS, default="object")
+    parser.add_argument("--candidate", choices=MODELS, default="vector")
+    parser.add_argument("--seeds", nargs="+", type=int, default=list(range(8)))
+    parser.add_argument("--months", type=int, default=200)
+    parser.add_argument("--num-buyers", type=int, default=2000)
+    parser.add_argument("--scenario", default="base", help="name from scenario.SCENARIOS")
+    parser.add_argument("--burn-in", type=int, default=24, help="months skipped by the statistical checks")
+    parser.add_argument("--thin", type=int, default=12, help="months between values used by the KS test")
+    parser.add_argument("--alpha", type=float, default=0.01, help="significance level of the tests")
+    parser.add_argument("--rtol", type=float, default=0.05, help="tolerance for mean and quantile differences")
+    parser.add_argument("--output", help="JSON file for the report")
+    args = parser.parse_args()
+
+    filterwarnings("ignore")
+    report = compare_engines(
+        args.reference, args.candidate, args.seeds, args.months, args.num_buyers, args.scenario,
+        args.burn_in, args.thin, args.alpha, args.rtol)
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    sys.exit(1 if report["verdict"] == "different" else 0)
+
+
+if __name__ == "__main__":
+    main()
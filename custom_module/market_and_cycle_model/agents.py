@@ -1,30 +1,37 @@
 import mesa
 import numpy as np
 from scipy.special import lambertw
-from .settings import *
+from .history import RollingWindow
+from .houses import GOVERNMENT
+from .population import sample_buyers
 from math import floor
 
+
 class Seller(mesa.Agent):
 
     def __init__(self, model):
         super().__init__(model)
-        self.forecast_horizon = FORECAST_HORIZON
-
-        self.reserve_history = [RESERVE_START]
-        self.produce_history = [PRODUCE_START]
-        self.produce_future = [PRODUCE_FUTURE_START for i in range(BUILD_SPEED)]
-        self.sold_history = [SOLD_START]
-        self.start_price_history = [PRICE_START]
-        self.sold_price_history = [PRICE_START]
-        self.current_prices = [PRICE_START]
-        self.extra_demand_history = [EXTRA_DEMAND_START]
-
-    def product(self, buyers_want_home=0):
+        config = model.config
+        self.forecast_horizon = config.FORECAST_HORIZON
+
+        # Храним только окно прогноза, полная история - в показателях модели.
+        # Средние - за forecast_horizon месяцев, но показатели читают history[-2]: в окне не меньше двух значений
+        capacity = max(self.forecast_horizon, 2)
+        self.reserve_history = RollingWindow(capacity, [config.RESERVE_START], span=self.forecast_horizon)
+        self.produce_history = RollingWindow(capacity, [config.PRODUCE_START], span=self.forecast_horizon)
+        self.produce_future = [config.PRODUCE_FUTURE_START for i in range(config.BUILD_SPEED)]
+        self.sold_history = RollingWindow(capacity, [config.SOLD_START], span=self.forecast_horizon)
+        self.start_price_history = RollingWindow(capacity, [config.PRICE_START], span=self.forecast_horizon)
+        self.sold_price_history = RollingWindow(capacity, [config.PRICE_START], span=self.forecast_horizon)
+        self.current_prices = [config.PRICE_START]
+        self.extra_demand_history = RollingWindow(capacity, [config.EXTRA_DEMAND_START], span=self.forecast_horizon)
+
+    def product(self, buyers_want_home=0, n_buyers=None):
 
         # Добавили цены
         if np.isnan(np.mean(self.current_prices)):
             self.sold_price_history.append(
-                np.mean(self.sold_price_history[-1])
+                self.sold_price_history[-1]
             )
         else:
             self.sold_price_history.append(
@@ -35,21 +42,19 @@ class Seller(mesa.Agent):
 
         # Создали дом
         finished_production_amount = self.produce_future.pop(0)
-        House.create_agents(
-            model=self.model,
+        self.model.build_houses(
             n=finished_production_amount,
-            price=FIRST_PRICE_MULT*np.mean(self.sold_price_history[-self.forecast_horizon:]))
+            price=self.model.config.FIRST_PRICE_MULT*self.sold_price_history.mean())
         self.produce_history.append(finished_production_amount)
         self.reserve_history.append(finished_production_amount + self.reserve_history[-1])
         self.extra_demand_history.append(buyers_want_home)
 
         # Выбираем строительство через n периодов
-        avg_extra_demand = np.mean(
-            self.extra_demand_history[-self.forecast_horizon:])
-        avg_produce = np.mean(self.produce_history[-self.forecast_horizon:])
-        avg_sold = np.mean(self.sold_history[-self.forecast_horizon:])
-        avg_start_price = np.mean(self.start_price_history[-self.forecast_horizon:])
-        avg_sold_price = np.mean(self.sold_price_history[-self.forecast_horizon:])
+        avg_extra_demand = self.extra_demand_history.mean()
+        avg_produce = self.produce_history.mean()
+        avg_sold = self.sold_history.mean()
+        avg_start_price = self.start_price_history.mean()
+        avg_sold_price = self.sold_price_history.mean()
 
         # self.produce_future.append(
         #    max(avg_extra_demand + avg_sold - avg_produce - np.mean(self.produce_future), 0)
@@ -74,8 +79,9 @@ class Seller(mesa.Agent):
         #    0
         #)
         #self.produce_future.append(n_new_houses)
-        n_buyers = len(self.model.agents_by_type[Buyer])
-        build_rate = int((15 + np.random.randint(0,5)) * (n_buyers/14600)) * 2 + int((avg_sold - self.reserve_history[-1])/14600)
+        if n_buyers is None: # Модели без агентов Buyer передают размер населения сами
+            n_buyers = len(self.model.agents_by_type[Buyer])
+        build_rate = int((15 + self.model.streams.developer.integers(0,5)) * (n_buyers/14600)) * 2 + int((avg_sold - self.reserve_history[-1])/14600)
         self.produce_future.append(build_rate)
 
         # Готовимся к продажам
@@ -86,246 +92,144 @@ class Seller(mesa.Agent):
         self.sold_history[-1] += 1
         self.current_prices.append(price)
 
+    def houses_bought(self, prices):
+        # house_bought для всех продаж рыночного клиринга разом
+        self.reserve_history[-1] -= len(prices)
+        self.sold_history[-1] += len(prices)
+        self.current_prices.extend(prices.tolist())
+
 
 class Buyer(mesa.Agent):
 
-    def __init__(self, model, age=-1, n_children=-1):
+    def __init__(self, model, age=-1, n_children=-1, wage=None, is_informed=None):
         super().__init__(model)
-        if n_children >= 0:
-            self.n_children = n_children
-        else:
-            self.n_children = np.random.choice(a=[0,1,2], p=[0.7, 0.2, 0.1])
-        self.kids_list = []
+        model.buyers_by_id[self.unique_id] = self
+        if wage is None: # Создание по одному. create_agents разыгрывает характеристики сразу для всех
+            traits = sample_buyers(model.streams, model.config, 1, age=age, n_children=n_children)
+            age, n_children, wage, is_informed = (
+                traits['age'][0], traits['n_children'][0], traits['wage'][0], traits['is_informed'][0])
+            model.totals.add(wage, age, n_children)
+        self.n_children = n_children  # Сами дети - в model.lineage
         self.additional_consumption = 0
         self.mortgage_monthly_payment = 0
-        self.is_informed = np.random.choice(a=[False, True], p=[0.5, 0.5])
-        self.wage = np.random.choice( # Данные из https://rosstat.gov.ru/folder/13397 "Распределение населения по интервальным группам среднедушевых денежных доходов"
-                a=[
-                    np.random.random() * 5000 + 5000,
-                    np.random.random() * 4000 + 10000,
-                    np.random.random() * 5000 + 14000,
-                    np.random.random() * 8000 + 19000,
-                    np.random.random() * 18000 + 27000,
-                    np.random.random() * 15000 + 45000,
-                    np.random.random() * 15000 + 60000,
-                    np.random.random() * 15000 + 75000,
-                    (np.random.chisquare(2) + 1) * 100000
-                ],
-                p=[
-                    0.032,
-                    0.047,
-                    0.078,
-                    0.138,
-                    0.262,
-                    0.144,
-                    0.094,
-                    0.091,
-                    0.114
-                ]
-            )
+        self.is_informed = is_informed
+        self.wage = wage # Данные из https://rosstat.gov.ru/folder/13397 "Распределение населения по интервальным группам среднедушевых денежных доходов"
         self.wealth = 0
         self.will_to_buy = 0
-        self.houses = mesa.agent.AgentSet([]) # Мб данные тут удаляются. Следить пристально: https://mesa.readthedocs.io/latest/mesa.html#mesa.agent.AgentSet:~:text=The%20implementation%20uses%20a%20WeakKeyDictionary%20to%20store%20agents%2C%20which%20means%20that%20agents%20not%20referenced%20elsewhere%20in%20the%20program%20may%20be%20automatically%20removed%20from%20the%20AgentSet.
-        if age == -1:
-            self.age = np.random.randint(ADOLESCENCE_AGE, OLD_AGE)
-        else:
-            self.age = age
+        self.n_houses = 0 # Сами дома - строки model.houses с owner == unique_id
+        self.age = age
+
+    @classmethod
+    def create_agents(cls, model, n, age=-1, n_children=-1):
+        # Зарплаты, дети, информированность и возраст разыгрываются разом для всех n агентов
+        traits = sample_buyers(model.streams, model.config, n, age=age, n_children=n_children)
+        model.totals.add(traits['wage'], traits['age'], traits['n_children'])
+        return super().create_agents(model, n, **traits)
 
     def change_state(self):
         # Выход на работу и рождение детей
-        if self.age > ADOLESCENCE_AGE:
-            disposable_income = self.wage * (1 - INCOME_TAX)
-            - AUTONOMOUS_CONSUMPTION
+        config = self.model.config
+        if self.age > config.ADOLESCENCE_AGE:
+            disposable_income = self.wage * (1 - config.INCOME_TAX)
+            - config.AUTONOMOUS_CONSUMPTION
             - self.mortgage_monthly_payment
-            self.model.agents_by_type[Government][0].taxes += self.wage * INCOME_TAX
+            self.model.agents_by_type[Government][0].taxes += self.wage * config.INCOME_TAX
             self.wealth += disposable_income - self.additional_consumption
-            if self.age < CLIMAX_AGE:
-                newborn = np.random.choice(a=[0, 1], p=[0.996, 0.004])
+            if self.age < config.CLIMAX_AGE:
+                newborn = int(self.model.streams.births() < 0.004)
             else:
                 newborn = 0
         else:
             newborn = 0
 
-        # Добавляем детей
+        # Добавляем детей. Сами агенты создаются разом в WorldModel.create_newborns
         if newborn > 0:
-            self.kids_list.extend(
-                list(
-                    self.create_agents(
-                        self.model,
-                        n=newborn,
-                        age=0,
-                        n_children=0)))
+            self.model.newborn_parents.append(self)
 
         self.model.births += newborn
         self.n_children += newborn
-        self.will_to_buy += (self.n_children + 1) / (len(self.houses) + 1)
+        self.will_to_buy += (self.n_children + 1) / (self.n_houses + 1)
 
-        # Добавляем старение и смерть
-        if self.age >= OLD_AGE:
+        # Добавляем старение и смерть. Наследство делится в WorldModel.settle_estates
+        if self.age >= config.OLD_AGE:
             self.model.deaths += 1
-            n_kids = len(self.kids_list)
-            if n_kids > 0:  # Если дети есть - наследство им
-                money_per_kid = self.wealth / n_kids
-                houses_per_kid = len(self.houses) // n_kids
-                houses_left = len(self.houses) % n_kids
-                for kid in self.kids_list:
-                    if houses_left > 0:
-                        kid.recieve_inheritance(
-                            money=money_per_kid, houses=self.houses[:houses_per_kid+1])
-                    else:
-                        kid.recieve_inheritance(
-                            money=money_per_kid, houses=self.houses[:houses_per_kid])
-                    houses_left -= 1
-            else:  # Если детей нет - наследство передаётся государству
-                self.model.agents_by_type[Government].do(
-                    "get_lost_inheritance",
-                    houses=self.houses,
-                    wealth=self.wealth
-                )
-            self.remove()
+            self.model.dead_buyers.append(self)
         else:
             self.age += 1
 
-    def generate_kids(self):
-        # Генерируем детей при первичном прогоне
-        self.kids_list = list(
-            self.create_agents(
-                self.model,
-                n=self.n_children,
-                age=np.random.randint(
-                    0,
-                    ADOLESCENCE_AGE),
-                n_children=0))
-
-    def generate_houses(self):
-        # Генерируем дома при первичном прогоне
-        # Работает только при STARTING_HOUSE_PER_PERSON от 0 до 1. Если нужно иначе, то придётся переписать
-        vacant_houses = self.model.agents_by_type[House].select(
-            lambda x: x.owner == 'developer'
-        )
-        if len(vacant_houses) > 0:
-            self.houses.add(
-                vacant_houses[0]
-            )
-            vacant_houses[0].owner = self.unique_id
-
-    def generate_wealth(self):
-        # Генерируем накопленное богатство при первичном прогоне
-        self.wealth = np.random.random() * WEALTH_MULTIPLIER - WEALTH_DIMINISHER
-
     def recieve_inheritance(self, money, houses):
         # Получаем наследство
         self.wealth += money
-        for house in houses:
-            self.houses.add(house)
-        mesa.agent.AgentSet(houses).do("change_owner", change=self.unique_id)
-
-    def recieve_government_help(self):
-        # Получаем поддержку от государства
-        government = self.model.agents_by_type[Government][0]
-        # Это немного случайный процесс. Кому-то повезёт, кому-то нет. Но в среднем все получат среднюю поддержку
-        if (government.inheritant_income > TRANSFERT_AMOUNT) and ((self.wealth < 0) or (self.wage < 10**5)):
-            self.wealth += TRANSFERT_AMOUNT
-            government.inheritant_income -= TRANSFERT_AMOUNT
-        if (len(government.houses) > 0) and (len(self.houses) == 0) and (self.age > ADOLESCENCE_AGE):
-            self.houses.add(government.houses[0])
-            government.houses.remove(government.houses[0])
-        if (government.taxes > TRANSFERT_AMOUNT) and government.redistribution_mode and ((self.wealth < 0) or (self.wage < 5*10**5)):
-        # Это немного случайный процесс. Кому-то повезёт, кому-то нет. Но в среднем все получат среднюю поддержку
-            if self.wage < 10**5:
-                self.wealth += 2*TRANSFERT_AMOUNT
-                government.taxes -= 2*TRANSFERT_AMOUNT
-                self.model.transfert_spending += 2*TRANSFERT_AMOUNT
-            else:
-                self.wealth += TRANSFERT_AMOUNT
-                government.taxes -= TRANSFERT_AMOUNT
-                self.model.transfert_spending += TRANSFERT_AMOUNT
+        self.n_houses += len(houses)
+        self.model.totals.houses += len(houses)
+        self.model.houses.owner[houses] = self.unique_id
 
     def select_desired_amount_alt(self, price):
         # TODO добавить первоначальный взнос в ипотеку
         # Функция полезности x^(кол-во детей)*y -> max
-        remaining_life = OLD_AGE - self.age + 1 # +1 костыль, чтобы избегать ZeroDivisionError, когда чел умирает
+        config = self.model.config
+        remaining_life = config.OLD_AGE - self.age + 1 # +1 костыль, чтобы избегать ZeroDivisionError, когда чел умирает
         mortgage_duration = remaining_life # В будущем поменять
-        disposable_income = self.wage * (1 - INCOME_TAX) - AUTONOMOUS_CONSUMPTION - self.mortgage_monthly_payment
+        disposable_income = self.wage * (1 - config.INCOME_TAX) - config.AUTONOMOUS_CONSUMPTION - self.mortgage_monthly_payment
         predicted_wealth = self.wealth + disposable_income * mortgage_duration
         mortgage_rates_list = [self.model.mortgage_rate]
-        if self.age < YOUTH_AGE: # Молодёжная ипотека
+        if self.age < config.YOUTH_AGE: # Молодёжная ипотека
             mortgage_rates_list.append(self.model.youth_mortgage_rate)
-        if len(self.kids_list) >= KIDS_THRESHOLD: # Семейная ипотека
+        if self.n_children >= config.KIDS_THRESHOLD: # Семейная ипотека
             mortgage_rates_list.append(self.model.family_mortgage_rate)
         selected_mortgage_rate = min(mortgage_rates_list)
-        monthly_mortgage_rate = (1 + selected_mortgage_rate) ** (1/12) - 1
+        mortgage_overpay_ratio = self.model.mortgage_pricing.overpay_ratio(selected_mortgage_rate, mortgage_duration)
         household_size = self.n_children + 1 # Дети + один родитель
-        if len(self.houses) == 0: # Если дома нет, то сильно увеличиваем его желание
+        if self.n_houses == 0: # Если дома нет, то сильно увеличиваем его желание
             household_size += 10 
-        mortgage_overpay_ratio = (
-            monthly_mortgage_rate + 
-            (monthly_mortgage_rate / ((1+monthly_mortgage_rate)**(mortgage_duration) - 1))
-        ) * mortgage_duration
-        desired_amount_cash = ( # Если покупка налом
-            (self.wealth * household_size) /
-            (price * lambertw(household_size*(self.wealth*np.e**(household_size))/price).real)
-        ) # Аналитически вычесленная формула максимума для конкретной функции полезности
-        desired_amount_mortgage = ( # Если покупка налом
-            (predicted_wealth * household_size) /
-            (price * (0.3 + 0.7*mortgage_overpay_ratio) * lambertw((household_size*predicted_wealth*np.e**household_size)/(price * (0.3 + 0.7*mortgage_overpay_ratio))).real)
-        ) # Аналитически вычесленная формула максимума для конкретной функции полезности
-        if desired_amount_cash > desired_amount_mortgage:
-            desired_home_cost = np.floor(desired_amount_cash) * price
-            if self.age > ADOLESCENCE_AGE: # Если человек взрослый, то он тратит на себя
-                self.additional_consumption = (predicted_wealth - desired_home_cost) * MARGINAL_CONSUMPTION_RATE / OLD_AGE
-            return ('cash', np.floor(desired_amount_cash), selected_mortgage_rate)
-        else:
-            desired_home_cost = np.floor(desired_amount_mortgage) * price * mortgage_overpay_ratio
-            if self.age > ADOLESCENCE_AGE:
-                self.additional_consumption = (predicted_wealth - desired_home_cost) * MARGINAL_CONSUMPTION_RATE / OLD_AGE
-            return ('mortgage', np.floor(desired_amount_mortgage), selected_mortgage_rate)
+        buying_type, desired_amount, desired_home_cost = select_desired_amount(
+            self.wealth, predicted_wealth, household_size, mortgage_overpay_ratio, price)
+        if self.age > config.ADOLESCENCE_AGE: # Если человек взрослый, то он тратит на себя
+            self.additional_consumption = (predicted_wealth - desired_home_cost) * config.MARGINAL_CONSUMPTION_RATE / config.OLD_AGE
+        return (buying_type, desired_amount, selected_mortgage_rate)
 
     def buy(self):
         # Процесс покупки
-        remaining_life = OLD_AGE - self.age + 1
+        remaining_life = self.model.config.OLD_AGE - self.age + 1
         mortgage_duration = remaining_life
         government = self.model.agents_by_type[Government][0]
-        if self.age < ADOLESCENCE_AGE: # Подростки не могут покупать
+        if self.age < self.model.config.ADOLESCENCE_AGE: # Подростки не могут покупать
             return None
-        if len(self.model.sorted_houses) > 0:
+        if len(self.model.developer_houses) > 0:
             if self.is_informed:
-                house = self.model.sorted_houses[0]
+                house = self.model.developer_houses.cheapest()
             else:
-                house = self.model.vacant_houses[0]
+                house = self.model.developer_houses.oldest()
+            price = self.model.houses.price[house].item()
             seller = self.model.agents_by_type[Seller][0]
-            buying_type, targeted_house_number, selected_mortgage_rate = self.select_desired_amount_alt(house.price)
+            buying_type, targeted_house_number, selected_mortgage_rate = self.select_desired_amount_alt(price)
         else:
             self.model.buyers_want_home += 1
             return None
-        if targeted_house_number > len(self.houses):
+        if targeted_house_number > self.n_houses:
             if buying_type == 'mortgage': # Если ипотека -  ежемесячно снимаем деньги
-                monthly_mortgage_rate = (1 + selected_mortgage_rate) ** (1/12) - 1
-                monthly_payment = (
-                        monthly_mortgage_rate + 
-                        (monthly_mortgage_rate / ((1+monthly_mortgage_rate)**(mortgage_duration) - 1))
-                    ) * house.price * 0.7 # Ежемесячный платёж
+                pricing = self.model.mortgage_pricing
+                monthly_payment = pricing.payment_factor(
+                    selected_mortgage_rate, mortgage_duration) * price * 0.7 # Ежемесячный платёж
                 self.mortgage_monthly_payment += monthly_payment
                 if (selected_mortgage_rate < self.model.mortgage_rate) or government.is_spending:
-                    full_mortgage_rate = (government.mortgage_percent_help + (1+monthly_mortgage_rate)**12 )** (1/12) - 1 
-                    full_payment = (
-                        full_mortgage_rate + 
-                        (full_mortgage_rate / ((1+full_mortgage_rate)**(mortgage_duration) - 1))
-                    ) * house.price * 0.7
+                    # Платёж по полной ставке, разницу банку доплачивает государство
+                    full_payment = pricing.payment_factor(
+                        selected_mortgage_rate, mortgage_duration, government.mortgage_percent_help) * price * 0.7
                     government.money_reserve -= (full_payment - monthly_payment) * mortgage_duration
                     self.model.program_spending += (full_payment - monthly_payment) * mortgage_duration
-                self.wealth -= house.price * 0.3 # Первоначальный взнос
+                self.wealth -= price * 0.3 # Первоначальный взнос
                 self.model.mortgages_bought += 1
                 self.model.mortgage_rates.append(selected_mortgage_rate)
                 self.model.mortgage_durations.append(mortgage_duration)
             elif buying_type == 'cash': # Если налик - снимаем деньги разово
-                self.wealth -= house.price
+                self.wealth -= price
                 self.model.cash_bought += 1
-            self.houses.add(house)
-            house.owner = self.unique_id  # Меняем владельца дома
-            seller.house_bought(house.price)  # Изменяем резервы продавца
-            self.model.sorted_houses.remove(house)
-            self.model.vacant_houses.remove(house)
+            self.n_houses += 1
+            self.model.totals.houses += 1
+            self.model.houses.owner[house] = self.unique_id  # Меняем владельца дома
+            seller.house_bought(price)  # Изменяем резервы продавца
+            self.model.developer_houses.remove(house)
 
 
     def __str__(self):
@@ -338,7 +242,7 @@ class Government(mesa.Agent):
         super().__init__(model)
         self.money_reserve = money_reserve
         self.taxes = 0
-        self.houses = mesa.agent.AgentSet([])
+        self.houses = []  # Дома без наследников, которые можно раздать
         self.inheritant_income = 0
         self.is_spending = False
         self.redistribution_mode = False
@@ -346,26 +250,85 @@ class Government(mesa.Agent):
     
     def get_lost_inheritance(self, houses, wealth):
         self.inheritant_income += wealth
-        for item in houses:
-            self.houses.add(item)
-
-
-class House(mesa.Agent):
-
-    def __init__(self, model, price, owner='developer'):
-        super().__init__(model)
-        self.owner = owner
-        self.months_without_buyer = 0
-        self.price = price + (np.random.random()/5 - 0.1) * price
-    
-    def change_owner(self, change):
-        # Менять владельца можно и без этой функции
-        # Но с ней через self.do() легко обновлять владельца нескольких домов одновременно
-        self.owner = change
-
-    def add_month_without_buyer(self):
-        # Менять дни без покупателя можно и без этой функции
-        # Но с ней через self.do() легко делать это для нескольких домов одновременно
-        self.months_without_buyer += 1
-        if self.months_without_buyer > 2:
-            self.price = max(0.95*self.price, MINIMUM_PRICE)
\ No newline at end of file
+        self.houses.extend(houses.tolist())
+        self.model.houses.owner[houses] = GOVERNMENT
+
+    def allocate_help(self, order, wealth, wage, homeless, n_houses):
+        # Вся помощь за месяц одним проходом по колонкам покупателей.
+        # Покупатели обходятся в порядке order (случайная перестановка от модели), бюджеты
+        # расходуются, пока остаток больше TRANSFERT_AMOUNT: кому-то повезёт, кому-то нет,
+        # но в среднем все получат среднюю поддержку.
+        # Возвращает выплаты по строкам, строки получивших дом и сумму перераспределения
+        transfert_amount = self.model.config.TRANSFERT_AMOUNT
+        wealth = wealth[order]
+        wage = wage[order]
+        payments = np.zeros(len(order))
+
+        # Наследство без наследников идёт бедным
+        eligible = (wealth < 0) | (wage < 10**5)
+        granted = _take_while_budget(eligible, transfert_amount, self.inheritant_income, transfert_amount)
+        payments[granted] += transfert_amount
+        self.inheritant_income -= transfert_amount * granted.sum()
+
+        # Дома без наследников - бездомным взрослым
+        handed = order[np.flatnonzero(homeless[order])[:n_houses]]
+
+        # Налоги раздаются только в режиме перераспределения
+        spent = 0
+        if self.redistribution_mode:
+            eligible = (wealth + payments < 0) | (wage < 5*10**5)
+            amount = np.where(wage < 10**5, 2*transfert_amount, transfert_amount)
+            granted = _take_while_budget(eligible, amount, self.taxes, transfert_amount)
+            spent = amount[granted].sum()
+            payments[granted] += amount[granted]
+            self.taxes -= spent
+
+        result = np.empty_like(payments)
+        result[order] = payments
+        return result, handed, spent
+
+
+def select_desired_amount(wealth, predicted_wealth, household_size, mortgage_overpay_ratio, price):
+    # Функция полезности x^(кол-во детей)*y -> max
+    # mortgage_overpay_ratio - во сколько раз выплаты по ипотеке больше кредита (MortgagePricing)
+    # Возвращает тип покупки, желаемое количество домов и их полную стоимость
+    desired_amount_cash = ( # Если покупка налом
+        (wealth * household_size) /
+        (price * lambertw(household_size*(wealth*np.e**(household_size))/price).real)
+    ) # Аналитически вычесленная формула максимума для конкретной функции полезности
+    desired_amount_mortgage = ( # Если покупка налом
+        (predicted_wealth * household_size) /
+        (price * (0.3 + 0.7*mortgage_overpay_ratio) * lambertw((household_size*predicted_wealth*np.e**household_size)/(price * (0.3 + 0.7*mortgage_overpay_ratio))).real)
+    ) # Аналитически вычесленная формула максимума для конкретной функции полезности
+    if desired_amount_cash > desired_amount_mortgage:
+        return ('cash', np.floor(desired_amount_cash), np.floor(desired_amount_cash) * price)
+    else:
+        return ('mortgage', np.floor(desired_amount_mortgage), np.floor(desired_amount_mortgage) * price * mortgage_overpay_ratio)
+
+
+def select_desired_amount_batch(wealth, predicted_wealth, household_size, mortgage_overpay_ratio, price, config):
+    # То же, что select_desired_amount, но сразу для массивов агентов (порядок операций тот же,
+    # поэтому результаты совпадают побитово со скалярной версией)
+    # Возвращает тип покупки, желаемое количество домов и дополнительное потребление
+    desired_amount_cash = ( # Если покупка налом
+        (wealth * household_size) /
+        (price * lambertw(household_size*(wealth*np.e**(household_size))/price).real)
+    )
+    desired_amount_mortgage = ( # Если покупка в ипотеку
+        (predicted_wealth * household_size) /
+        (price * (0.3 + 0.7*mortgage_overpay_ratio) * lambertw((household_size*predicted_wealth*np.e**household_size)/(price * (0.3 + 0.7*mortgage_overpay_ratio))).real)
+    )
+    is_cash = desired_amount_cash > desired_amount_mortgage
+    desired_amount = np.floor(np.where(is_cash, desired_amount_cash, desired_amount_mortgage))
+    desired_home_cost = np.where(
+        is_cash,
+        desired_amount * price,
+        desired_amount * price * mortgage_overpay_ratio)
+    additional_consumption = (predicted_wealth - desired_home_cost) * config.MARGINAL_CONSUMPTION_RATE / config.OLD_AGE
+    return np.where(is_cash, 'cash', 'mortgage'), desired_amount, additional_consumption
+
+
+def _take_while_budget(eligible, amount, budget, threshold):
+    # Маска получивших выплату: выплата идёт, пока остаток бюджета > threshold (TRANSFERT_AMOUNT)
+    spent_before = np.cumsum(np.where(eligible, amount, 0)) - np.where(eligible, amount, 0)
+    return eligible & (budget - spent_before > threshold)
@@ -0,0 +1,60 @@
+import numpy as np
+
+# Суммы, которые сверяются с полным пересчётом: имя -> колонка покупателей
+TOTALS_COLUMNS = {
+    "wage": "wage",
+    "age": "age",
+    "children": "n_children",
+    "houses": "n_houses",
+}
+
+
+class PopulationTotals:
+    # Суммы по живым покупателям для показателей модели. Зарплата не меняется после создания,
+    # остальное меняется только в известных местах: рождение, старение, смерть, покупка,
+    # наследство, дом от государства, переезд. Там суммы и обновляются, поэтому показатели
+    # за месяц читаются за O(1) без прохода по всем покупателям
+
+    def __init__(self):
+        self.population = 0
+        self.wage = 0.0
+        self.age = 0
+        self.children = 0
+        self.houses = 0
+
+    def add(self, wage, age, children, houses=0):
+        # Новые покупатели: числа для одного или массивы для нескольких
+        self.population += np.size(wage)
+        self.wage += float(np.sum(wage))
+        self.age += int(np.sum(age))
+        self.children += int(np.sum(children))
+        self.houses += int(np.sum(houses))
+
+    def remove(self, wage, age, children, houses):
+        # Умершие или уехавшие покупатели
+        self.population -= np.size(wage)
+        self.wage -= float(np.sum(wage))
+        self.age -= int(np.sum(age))
+        self.children -= int(np.sum(children))
+        self.houses -= int(np.sum(houses))
+
+    def average_wage(self):
+        return self.wage / self.population
+
+    def average_age(self):
+        return self.age / self.population
+
+
+def check_totals(totals, buyers):
+    # Отладочная сверка сумм с полным пересчётом по колонкам покупателей (get_buyer_columns).
+    # Зарплаты - числа с плавающей точкой, их сумма накапливается в другом порядке
+    mismatched = []
+    if totals.population != len(buyers["wage"]):
+        mismatched.append("population: {} != {}".format(totals.population, len(buyers["wage"])))
+    for name, column in TOTALS_COLUMNS.items():
+        value = getattr(totals, name)
+        recount = buyers[column].sum()
+        if not np.isclose(value, recount, rtol=1e-9, atol=0):
+            mismatched.append("{}: {} != {}".format(name, value, recount))
+    if mismatched:
+        raise RuntimeError('Population totals differ from a full recount: {}'.format('; '.join(mismatched)))
@@ -0,0 +1,128 @@
+import mesa
+from .agents import Seller, Government
+from .config import DEFAULT_CONFIG
+from .history import RollingWindow
+from .houses import HouseStore
+from .market import MARKET_CLEARING
+from .metrics import MetricsRecorder
+from .mortgage import MortgagePricing
+from .order_book import HouseOrderBook
+from .streams import RandomStreams
+from math import floor
+
+
+class BaseWorldModel(mesa.Model):
+    # Общая часть WorldModel и VectorWorldModel: дома, застройщик, государство, ставки,
+    # счётчики месяца, показатели и порядок фаз шага.
+    # Наследники хранят покупателей по-своему (агенты mesa или колонки BuyerPopulation)
+    # и реализуют всё, что с ними работает:
+    # create_buyers, generate_kids, generate_houses, generate_wealth - начальные условия;
+    # change_state, recieve_government_help, buy_in_order, clear_market - фазы шага;
+    # count_buyers, get_buyer_wealth, get_buyer_columns - для показателей и профайлера
+
+    # Фазы шага по порядку - методы модели. Так их можно замерять по отдельности
+    STEP_PHASES = (
+        "update_world",
+        "change_state",
+        "recieve_government_help",
+        "buy",
+        "product",
+        "reprice_houses",
+        "collect",
+    )
+
+    def __init__(self, num_buyers, seed=None, mortgage_rate=None, snapshot_every=None,
+                 profiler=None, check_totals=False, config=DEFAULT_CONFIG):
+        super().__init__(seed=seed)
+        self.config = config  # Параметры прогона (config.ModelConfig), по умолчанию - settings.py
+        self.streams = RandomStreams(seed)  # Все случайные числа модели
+        self.num_buyers = num_buyers
+        self.houses = HouseStore(config)  # Все дома модели
+        self.developer_houses = HouseOrderBook(self.houses)  # Непроданные дома застройщика
+        self.mortgage_rate = config.STARTING_MORTGAGE_RATE if mortgage_rate is None else mortgage_rate
+        self.youth_mortgage_rate = config.YOUTH_MORTGAGE_RATE
+        self.family_mortgage_rate = config.FAMILY_MORTGAGE_RATE
+        self.mortgages_bought = 0
+        self.cash_bought = 0
+        self.deaths = 0
+        self.births = 0
+        self.program_spending = 0
+        self.transfert_spending = 0
+        self.mortgage_rates = []
+        self.mortgage_durations = RollingWindow(50)  # Для HAI нужны только последние сроки
+        self.mortgage_pricing = MortgagePricing(config)
+        self.market_clearing = 'sequential'  # См. market.MARKET_CLEARING
+
+        # Создаём агентов
+        self.create_buyers(num_buyers)
+        self.build_houses(n=floor(num_buyers * config.STARTING_HOUSE_PER_PERSON), price=config.PRICE_START)
+        Seller.create_agents(model=self, n=1)
+        Government.create_agents(model=self, n=1)
+
+        # Генерируем начальные условия
+        self.generate_kids()
+        self.generate_houses()
+        self.generate_wealth()
+
+        # Заново генерируем резервы застройщикам, т.к. в generate_houses раздали все дома
+        self.build_houses(n=config.RESERVE_START, price=config.PRICE_START)
+
+        self.datacollector = MetricsRecorder(snapshot_every=snapshot_every, check_totals=check_totals)
+        self.profiler = profiler  # StepProfiler для замера фаз шага или None
+        self.buyers_want_home = 0
+
+    @property
+    def market_clearing(self):
+        return self._market_clearing
+
+    @market_clearing.setter
+    def market_clearing(self, value):
+        # Задаётся и политикой (scenario.apply_policy), поэтому проверяется при каждой установке:
+        # опечатка не должна молча включать последовательный клиринг
+        if value not in MARKET_CLEARING:
+            raise ValueError('Unknown market_clearing {!r}, expected one of {}'.format(value, MARKET_CLEARING))
+        self._market_clearing = value
+
+    def reseed(self, seed):
+        # Новые потоки случайных чисел, например для повторов из одного прогретого состояния
+        self.streams = RandomStreams(seed)
+
+    def build_houses(self, n, price):
+        # Новые дома застройщика, выставленные на продажу
+        self.developer_houses.add(self.houses.build(n, price, self.streams.pricing, build_month=self.steps))
+
+    def update_world(self):
+        self.buyers_want_home = 0
+        self.mortgages_bought = 0
+        self.cash_bought = 0
+        self.deaths = 0
+        self.births = 0
+        self.transfert_spending = 0
+        self.mortgage_rates = []
+
+    def step(self):
+        if self.profiler is not None:
+            self.profiler.run_step(self)
+            return
+        for phase in self.STEP_PHASES:
+            getattr(self, phase)()
+
+    def buy(self):
+        if self.market_clearing == 'batch':
+            self.clear_market()
+        else:
+            self.buy_in_order()
+
+    def product(self):
+        self.agents_by_type[Seller].do(
+            "product", buyers_want_home=self.buyers_want_home, n_buyers=self.count_buyers()
+        )
+
+    def reprice_houses(self):
+        self.developer_houses.add_month_without_buyer()
+
+    def collect(self):
+        self.datacollector.collect(self)
+
+    def __str__(self):
+        return 'Current world state (settings)'
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from .config import DEFAULT_CONFIG
+from .scenario import BASE_POLICY, create_model, run_model
+from .snapshot import load_snapshot, save_snapshot
+
+PACKAGE_DIR = Path(__file__).resolve().parent
+# Кэш по умолчанию - вне репозитория, переопределяется переменной окружения
+CACHE_DIR = Path(os.environ.get('MARKET_MODEL_CACHE', Path.home() / '.cache' / 'market_and_cycle_model'))
+MAX_CACHE_BYTES = 2 * 1024**3
+
+
+def code_version():
+    # Хэш исходников пакета: любое изменение кода модели делает старые записи недостижимыми
+    digest = hashlib.sha256()
+    for path in sorted(PACKAGE_DIR.glob('*.py')):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError('Cannot hash {!r} for the run cache'.format(value))
+
+
+class RunCache:
+    # Кэш прогонов сценариев на диске. Ключ - хэш параметров модели (config), аргументов модели, зерна,
+    # расписания событий и версии кода; число месяцев в ключ не входит. В записи лежат
+    # показатели самого длинного посчитанного прогона и (checkpoints=True) снимок модели
+    # на его последнем месяце:
+    # - запрос на months не длиннее записанного отдаётся из показателей сразу;
+    # - более длинный продолжает модель со снимка, а не считает сначала.
+    # Записи, к которым дольше всего не обращались, удаляются, пока кэш больше max_bytes.
+    # Прогоны без зерна (seed=None) не воспроизводятся и не кэшируются
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, checkpoints=True):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.checkpoints = checkpoints
+
+    def request(self, events, num_buyers, seed, policy, engine, config=DEFAULT_CONFIG):
+        # Всё, от чего зависят показатели прогона (кроме числа месяцев)
+        return {
+            "settings": config._asdict(),
+            "engine": engine,
+            "num_buyers": num_buyers,
+            "seed": seed,
+            "policy": policy,
+            "events": {str(month): events[month] for month in sorted(events)},
+            "code": code_version(),
+        }
+
+    def key(self, request):
+        text = json.dumps(request, sort_keys=True, default=_jsonable)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def run(self, events=None, months=200, num_buyers=10000, seed=0, policy=BASE_POLICY, engine='object',
+            config=DEFAULT_CONFIG):
+        # Как scenario.run_scenario, но через кэш
+        events = events or {}
+        if seed is None:
+            model = create_model(num_buyers=num_buyers, seed=seed, policy=policy, engine=engine, config=config)
+            return run_model(model, months, events).datacollector.get_model_vars_dataframe()
+        request = self.request(events, num_buyers, seed, policy, engine, config)
+        entry = self.directory / self.key(request)
+        metrics_path = entry / 'metrics.pkl'
+        checkpoint_path = entry / 'checkpoint.pkl.gz'
+        if metrics_path.exists():
+            os.utime(metrics_path)  # Для вытеснения давно не использованных записей
+            metrics = pd.read_pickle(metrics_path)
+            if len(metrics) >= months:
+                return metrics.iloc[:months]
+
+        if checkpoint_path.exists():
+            model = load_snapshot(checkpoint_path)
+        else:
+            model = create_model(num_buyers=num_buyers, seed=seed, policy=policy, engine=engine, config=config)
+        run_model(model, months, events, start=model.steps)
+        metrics = model.datacollector.get_model_vars_dataframe()
+
+        # Показатели пишутся раньше снимка: после падения между записями снимок может быть
+        # только старше показателей, и продолжение с него досчитывает недостающие месяцы.
+        # Если снимок всё же длиннее запроса, лишние строки отрезаются
+        entry.mkdir(parents=True, exist_ok=True)
+        (entry / 'request.json').write_text(json.dumps(request, indent=2, default=_jsonable))
+        _replace(metrics_path, metrics.to_pickle)
+        if self.checkpoints:
+            _replace(checkpoint_path, lambda path: save_snapshot(model, path))
+        self.evict()
+        return metrics.iloc[:months]
+
+    def entries(self):
+        # Записи кэша от давно не использованных к недавним: (время обращения, размер, путь)
+        entries = []
+        if not self.directory.exists():
+            return entries
+        for entry in self.directory.iterdir():
+            metrics_path = entry / 'metrics.pkl'
+            if not metrics_path.exists():
+                continue
+            size = sum(path.stat().st_size for path in entry.iterdir())
+            entries.append((metrics_path.stat().st_mtime, size, entry))
+        return sorted(entries)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _replace(path, write):
+    # Файл появляется под своим именем только целиком (как части прогона в runner.write_chunk)
+    temporary = path.with_name(path.name + '.tmp')
+    write(temporary)
+    os.replace(temporary, path)
+
+
+def cached_scenario(events=None, months=200, num_buyers=10000, seed=0, policy=BASE_POLICY, engine='object',
+                    config=DEFAULT_CONFIG, cache=None):
+    # run_scenario через кэш: для ноутбуков, где одни и те же сценарии считаются после каждого перезапуска
+    return (cache or RunCache()).run(events, months, num_buyers, seed, policy, engine, config)
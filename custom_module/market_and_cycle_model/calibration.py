@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from .config import make_config
+from .scenario import run_scenario
+
+DATA_DIR = Path(__file__).resolve().parents[2] / 'data'
+
+# Параметры settings.py, которые подбираются по умолчанию, и границы поиска
+DEFAULT_BOUNDS = {
+    "FIRST_PRICE_MULT": (1.0, 1.3),
+    "WEALTH_MULTIPLIER": (2 * 10**6, 15 * 10**6),
+    "MARGINAL_CONSUMPTION_RATE": (0.1, 0.9),
+}
+
+# Вес каждого ряда в функции потерь
+LOSS_WEIGHTS = {
+    "pir": 1.0,
+    "hai": 1.0,
+    "price": 1.0,
+    "mortgages": 0.5,
+}
+
+
+def load_targets(data_dir=DATA_DIR):
+    # Помесячные ряды за 48 месяцев и поквартальные КДЖ/HAI
+    mortgage = pd.read_csv(Path(data_dir) / 'cb_mortgage_data.csv')
+    prices = pd.read_csv(Path(data_dir) / 'real_estate_deals_primary_market.csv')
+    wages = pd.read_csv(Path(data_dir) / 'nominal_wages.csv')
+    kdzh = pd.read_csv(Path(data_dir) / 'kdzh.csv')
+    # В модели зарплаты не растут, поэтому сравниваем цену в зарплатах
+    real_price = prices['price'].to_numpy() / wages['wage'].to_numpy()
+    return {
+        "rate": mortgage['rate'].to_numpy() / 100,
+        "mortgages": mortgage['credit_amount'].to_numpy(),
+        "price": real_price,
+        "pir": kdzh['kdzh_rf'].to_numpy(),
+        "hai": kdzh['hai'].to_numpy(),
+    }
+
+
+def calibration_loss(metrics, targets):
+    # metrics - показатели модели за месяцы, соответствующие данным.
+    # КДЖ и HAI сравниваются по уровню, цены и число ипотек - по динамике
+    quarters = np.arange(len(metrics)) // 3
+    pir = metrics['pir'].groupby(quarters).mean().to_numpy()
+    hai = metrics['hai'].groupby(quarters).mean().to_numpy()
+    price = metrics['sold_price'].to_numpy()
+    mortgages = metrics['mortgages_bought'].rolling(3, min_periods=1).mean().to_numpy()
+    components = {
+        "pir": np.nanmean(((pir - targets['pir']) / targets['pir'])**2),
+        "hai": np.nanmean(((hai - targets['hai']) / targets['hai'])**2),
+        "price": np.mean((price / price[0] - targets['price'] / targets['price'][0])**2),
+        "mortgages": np.mean(
+            (mortgages / max(mortgages.mean(), 1) - targets['mortgages'] / targets['mortgages'].mean())**2),
+    }
+    loss = sum(LOSS_WEIGHTS[name] * value for name, value in components.items())
+    return (np.inf if np.isnan(loss) else loss), components
+
+
+def evaluate(params, targets, num_buyers, burn_in, seed):
+    # Прогрев burn_in месяцев, затем ставка ипотеки идёт по данным ЦБ
+    events = {burn_in - 1 + i: {"mortgage_rate": rate} for i, rate in enumerate(targets['rate'])}
+    metrics = run_scenario(
+        events, months=burn_in + len(targets['rate']), num_buyers=num_buyers, seed=seed, config=make_config(params))
+    return calibration_loss(metrics.iloc[burn_in:].reset_index(drop=True), targets)
+
+
+def sample_candidates(bounds, n, rng):
+    # Латинский гиперкуб: каждый параметр покрывает n равных интервалов своего диапазона
+    candidates = [{} for _ in range(n)]
+    for name, (low, high) in bounds.items():
+        points = (rng.permutation(n) + rng.random(n)) / n
+        for candidate, point in zip(candidates, points):
+            candidate[name] = float(low + point * (high - low))
+    return candidates
+
+
+def calibrate(bounds=DEFAULT_BOUNDS, n_candidates=32, population_stages=(1000, 3000, 10000), keep=0.25,
+              burn_in=150, seed=0, processes=None, data_dir=DATA_DIR):
+    # Поиск параметров с ранним отсевом: все кандидаты считаются на маленьком населении,
+    # на следующую ступень с большим населением проходит доля keep лучших.
+    # Все кандидаты одной ступени считаются параллельно с одним и тем же зерном
+    targets = load_targets(data_dir)
+    candidates = sample_candidates(bounds, n_candidates, np.random.default_rng(seed))
+    evaluations = []
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for stage, num_buyers in enumerate(population_stages):
+            futures = [
+                pool.submit(evaluate, params, targets, num_buyers, burn_in, seed)
+                for params in candidates]
+            results = [future.result() for future in futures]
+            for params, (loss, components) in zip(candidates, results):
+                evaluations.append({"stage": stage, "num_buyers": num_buyers, **params, "loss": loss, **{
+                    "loss_" + name: value for name, value in components.items()}})
+            order = np.argsort([loss for loss, components in results], kind='stable')
+            if stage < len(population_stages) - 1:
+                candidates = [candidates[i] for i in order[:max(1, int(len(candidates) * keep))]]
+            else:
+                best = order[0]
+    return {
+        "params": candidates[best],
+        "loss": results[best][0],
+        "components": results[best][1],
+        "evaluations": pd.DataFrame(evaluations),
+    }
@@ -0,0 +1,19 @@
+from collections import namedtuple
+from . import settings
+
+# Параметры модели - все константы settings.py
+SETTINGS_NAMES = tuple(name for name in vars(settings) if name.isupper())
+
+# Неизменяемый набор параметров одного прогона. Модель хранит его в model.config, агенты
+# и функции модели читают параметры только оттуда, поэтому модели с разными параметрами
+# можно считать в одном процессе. Варианты - через make_config или config._replace
+ModelConfig = namedtuple('ModelConfig', SETTINGS_NAMES)
+
+# Значения из settings.py
+DEFAULT_CONFIG = ModelConfig(**{name: getattr(settings, name) for name in SETTINGS_NAMES})
+
+
+def make_config(overrides=None, base=DEFAULT_CONFIG):
+    # base с заменёнными параметрами: make_config({"FIRST_PRICE_MULT": 1.2}).
+    # Неизвестное имя - ValueError
+    return base._replace(**(overrides or {}))
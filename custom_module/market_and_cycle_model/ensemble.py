@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from .config import DEFAULT_CONFIG
+from .scenario import BASE_POLICY, create_model, run_model, run_scenario
+from .snapshot import load_snapshot, save_snapshot
+
+# Границы полос по умолчанию: 5%, медиана и 95%
+QUANTILES = (0.05, 0.5, 0.95)
+
+
+def replicate_seeds(seed, replicates):
+    # Независимые зёрна повторов из одного зерна ансамбля - единственное место, где зёрна
+    # порождаются из другого зерна. Каждый повтор затем строит свои RandomStreams из своего зерна
+    return [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(replicates)]
+
+
+def run_replicate(path, seed, events, months):
+    # Один повтор из общего прогретого состояния: те же агенты, свои случайные числа дальше
+    model = load_snapshot(path)
+    model.reseed(seed)
+    run_model(model, months, events, start=model.steps)
+    return model.datacollector.get_model_vars_dataframe()
+
+
+def run_replicates(events=None, replicates=100, months=200, num_buyers=10000, seed=0, policy=BASE_POLICY,
+                   engine='object', burn_in=None, processes=None, config=DEFAULT_CONFIG):
+    # Повторы одного сценария с разными зёрнами. Возвращает таблицу replicate, step и все показатели.
+    # burn_in=k - первые k месяцев считаются один раз, а повторы расходятся уже из этого состояния:
+    # так 100 повторов стоят 100 * (months - k) месяцев вместо 100 * months.
+    # События до burn_in применяются к общему прогреву.
+    # processes=0 - по очереди в текущем процессе, иначе в пуле процессов
+    events = events or {}
+    seeds = replicate_seeds(seed, replicates)
+    with TemporaryDirectory() as directory:
+        if burn_in:
+            model = create_model(num_buyers=num_buyers, seed=seed, policy=policy, engine=engine, config=config)
+            run_model(model, burn_in, events)
+            path = Path(directory) / 'burn_in.pkl.gz'
+            save_snapshot(model, path)
+            tasks = [(run_replicate, path, replicate_seed, events, months) for replicate_seed in seeds]
+        else:
+            tasks = [
+                (run_scenario, events, months, num_buyers, replicate_seed, policy, engine, config)
+                for replicate_seed in seeds]
+        if processes == 0:
+            results = [task[0](*task[1:]) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                futures = [pool.submit(*task) for task in tasks]
+                results = [future.result() for future in futures]
+    frames = []
+    for replicate, result in enumerate(results):
+        result = result.rename_axis("step").reset_index()
+        result.insert(0, "replicate", replicate)
+        frames.append(result)
+    return pd.concat(frames, ignore_index=True)
+
+
+def ensemble_bands(runs, quantiles=QUANTILES):
+    # Среднее, стандартное отклонение и квантили каждого показателя по повторам на каждом шаге.
+    # Колонки - (показатель, статистика), например ("sold_price", "q0.05")
+    metrics = runs.drop(columns=["replicate"]).groupby("step")
+    stats = {"mean": metrics.mean(), "std": metrics.std()}
+    for quantile in quantiles:
+        stats["q{:g}".format(quantile)] = metrics.quantile(quantile)
+    return pd.concat(stats, axis=1).swaplevel(axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+
+
+def run_ensemble(events=None, replicates=100, quantiles=QUANTILES, **kwargs):
+    # Ансамбль повторов сценария: полосы по всем показателям (см. ensemble_bands).
+    # kwargs передаются в run_replicates (months, num_buyers, seed, policy, engine, burn_in, processes, config)
+    return ensemble_bands(run_replicates(events, replicates, **kwargs), quantiles)
+
+
+def period_ratio(runs, month, metric="sold_price", before=12, after=36):
+    # Отношение среднего показателя за after месяцев начиная с month к среднему за before
+    # месяцев до него - по каждому повтору. Как в ноутбуке govhelp ([162:198] к [150:162]),
+    # но с распределением по повторам вместо одного числа
+    steps = runs["step"]
+    after_mean = runs[(steps >= month) & (steps < month + after)].groupby("replicate")[metric].mean()
+    before_mean = runs[(steps >= month - before) & (steps < month)].groupby("replicate")[metric].mean()
+    return after_mean / before_mean
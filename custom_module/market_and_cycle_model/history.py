@@ -0,0 +1,52 @@
+import numpy as np
+
+
+class RollingWindow:
+    # История фиксированной длины: хранит только последние capacity значений и их сумму,
+    # поэтому среднее за окно считается за O(1), а память не растёт со временем.
+    # Поддерживает то, что нужно моделям: append, window[-1], window[-2], window[-1] += x, mean().
+    # span - сколько последних значений входит в mean(), по умолчанию все capacity
+
+    def __init__(self, capacity, values=(), span=None):
+        self.capacity = capacity
+        self.span = capacity if span is None else span
+        self.values = np.zeros(capacity)
+        self.position = 0  # Куда запишется следующее значение
+        self.size = 0
+        self.total = 0.0
+        for value in values:
+            self.append(value)
+
+    def __len__(self):
+        return self.size
+
+    def append(self, value):
+        if self.size >= self.span:
+            self.total -= self[-self.span]  # Значение выходит из окна среднего
+        if self.size < self.capacity:
+            self.size += 1
+        self.values[self.position] = value
+        self.total += value
+        self.position = (self.position + 1) % self.capacity
+        if self.position == 0:
+            # Раз за оборот пересчитываем сумму заново, чтобы не копилась ошибка округления
+            self.total = self.values[self.capacity - self.span:].sum()
+
+    def _index(self, index):
+        if not -self.size <= index < 0:
+            raise IndexError('RollingWindow supports only the last {} values'.format(self.size))
+        return (self.position + index) % self.capacity
+
+    def __getitem__(self, index):
+        return self.values[self._index(index)].item()
+
+    def __setitem__(self, index, value):
+        i = self._index(index)
+        if index >= -self.span:
+            self.total += value - self.values[i]
+        self.values[i] = value
+
+    def mean(self):
+        if self.size == 0:
+            return np.nan
+        return self.total / min(self.size, self.span)
@@ -0,0 +1,41 @@
+import numpy as np
+
+
+class LineageIndex:
+    # Связи родитель -> ребёнок двумя массивами unique_id в порядке рождения.
+    # Заменяет списки агентов kids_list: не держит ссылок на удалённых агентов,
+    # а детей всех умерших за месяц находит одним запросом
+
+    def __init__(self):
+        self.parent = np.empty(0, dtype=np.int64)
+        self.child = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.child)
+
+    def add(self, parents, children):
+        self.parent = np.concatenate([self.parent, np.asarray(parents, dtype=np.int64)])
+        self.child = np.concatenate([self.child, np.asarray(children, dtype=np.int64)])
+
+    def children_of(self, dead):
+        # Наследники умерших dead: (id ребёнка, id родителя, номер среди братьев и сестёр).
+        # Дети, умершие в тот же месяц, не наследуют
+        positions = np.flatnonzero(np.isin(self.parent, dead) & ~np.isin(self.child, dead))
+        estate = self.parent[positions]
+        return self.child[positions], estate, sibling_rank(estate)
+
+    def discard(self, ids):
+        # Убираем умерших: их дети больше не наследники, а сами они больше не наследуют
+        keep = ~(np.isin(self.parent, ids) | np.isin(self.child, ids))
+        self.parent = self.parent[keep]
+        self.child = self.child[keep]
+
+
+def sibling_rank(estate):
+    # Порядковый номер каждой строки среди строк с тем же родителем (строки идут по рождению)
+    order = np.argsort(estate, kind='stable')
+    sorted_estate = estate[order]
+    group_start = np.searchsorted(sorted_estate, sorted_estate, side='left')
+    rank = np.empty(len(estate), dtype=np.int64)
+    rank[order] = np.arange(len(estate)) - group_start
+    return rank
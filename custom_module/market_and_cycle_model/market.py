@@ -0,0 +1,154 @@
+import numpy as np
+from .agents import Seller, Government, select_desired_amount_batch
+
+# Как покупатели выходят на рынок в фазе buy (атрибут модели market_clearing, можно менять через политику):
+# 'sequential' - по одному в порядке агентов, спрос каждого считается по ценам после предыдущей покупки;
+# 'batch' - clear_market: спрос всех разом по ценам начала фазы и одно сопоставление с предложением
+MARKET_CLEARING = ('sequential', 'batch')
+
+
+def select_mortgage_rates(model, age, n_children):
+    # Минимальная доступная ставка для каждого агента, как в Buyer.select_desired_amount_alt
+    selected_mortgage_rate = np.full(len(age), model.mortgage_rate)
+    youth = age < model.config.YOUTH_AGE  # Молодёжная ипотека
+    selected_mortgage_rate[youth] = np.minimum(selected_mortgage_rate[youth], model.youth_mortgage_rate)
+    family = n_children >= model.config.KIDS_THRESHOLD  # Семейная ипотека
+    selected_mortgage_rate[family] = np.minimum(selected_mortgage_rate[family], model.family_mortgage_rate)
+    return selected_mortgage_rate
+
+
+def demand(model, columns, rows, price):
+    # Спрос агентов rows при ценах price, как в Buyer.select_desired_amount_alt.
+    # Возвращает тип покупки, желаемое количество домов, доп. потребление, ставку и срок ипотеки
+    config = model.config
+    age = columns["age"][rows]
+    mortgage_duration = config.OLD_AGE - age + 1
+    disposable_income = columns["wage"][rows] * (1 - config.INCOME_TAX) - config.AUTONOMOUS_CONSUMPTION - columns["mortgage_monthly_payment"][rows]
+    predicted_wealth = columns["wealth"][rows] + disposable_income * mortgage_duration
+    household_size = columns["n_children"][rows] + 1 + 10 * (columns["n_houses"][rows] == 0)
+    selected_mortgage_rate = select_mortgage_rates(model, age, columns["n_children"][rows])
+    buying_type, desired_amount, additional_consumption = select_desired_amount_batch(
+        columns["wealth"][rows], predicted_wealth, household_size,
+        model.mortgage_pricing.overpay_ratios(selected_mortgage_rate, mortgage_duration), price, config)
+    return buying_type, desired_amount, additional_consumption, selected_mortgage_rate, mortgage_duration
+
+
+def reservation_ranks(model, columns, rows, prices):
+    # Для каждого агента rows - сколько первых цен из отсортированного по возрастанию prices
+    # он готов заплатить (спрос больше числа его домов). Спрос падает с ценой, поэтому
+    # это бинарный поиск по prices сразу для всех агентов
+    low = np.zeros(len(rows), dtype=np.int64)
+    high = np.full(len(rows), len(prices), dtype=np.int64)
+    active = np.flatnonzero(low < high)
+    while len(active) > 0:
+        middle = (low[active] + high[active]) // 2
+        _, desired_amount, _, _, _ = demand(model, columns, rows[active], prices[middle])
+        wants = desired_amount > columns["n_houses"][rows[active]]
+        low[active] = np.where(wants, middle + 1, low[active])
+        high[active] = np.where(wants, high[active], middle)
+        active = active[low[active] < high[active]]
+    return low
+
+
+def match_orders(informed, reservation, by_price, by_age):
+    # Сопоставление заявок с предложением за один проход по очереди заявок: i-я заявка смотрит
+    # на самый дешёвый (informed[i]) или самый старый непроданный дом и покупает его, если его
+    # место в by_price меньше reservation[i]. Проход кончается, когда продан последний дом.
+    # Возвращает для пройденных заявок увиденный дом и признак покупки
+    rank = dict(zip(by_price.tolist(), range(len(by_price))))
+    taken = set()
+    seen = []
+    bought = []
+    cheap = old = 0
+    by_price = by_price.tolist()
+    by_age = by_age.tolist()
+    for is_informed, limit in zip(informed.tolist(), reservation.tolist()):
+        if len(taken) == len(by_price):
+            break
+        if is_informed:
+            while by_price[cheap] in taken:
+                cheap += 1
+            house = by_price[cheap]
+        else:
+            while by_age[old] in taken:
+                old += 1
+            house = by_age[old]
+        if rank[house] < limit:
+            taken.add(house)
+        seen.append(house)
+        bought.append(rank[house] < limit)
+    return np.array(seen, dtype=np.int64), np.array(bought, dtype=bool)
+
+
+def clear_market(model, columns):
+    # Фаза buy одним расчётом по колонкам покупателей (columns - как у get_buyer_columns, плюс
+    # mortgage_monthly_payment, additional_consumption и is_informed).
+    # 1. Спрос всех взрослых (тип покупки, желаемое количество, ставка) по ценам начала фазы:
+    #    информированные смотрят на самый дешёвый дом, остальные - на самый старый.
+    # 2. Для желающих купить - предельная цена (reservation_ranks): дальше спрос не пересчитывается.
+    # 3. Желающие выстраиваются в случайном порядке (поток ordering) и за один проход
+    #    получают дома из очередей по цене и по возрасту (match_orders).
+    # 4. Деньги, ипотека, субсидии, владельцы домов и продажи застройщика - обновления массивов.
+    # Колонки wealth, mortgage_monthly_payment, n_houses и additional_consumption меняются на месте.
+    # Возвращает строки, у которых они могли измениться
+    government = model.agents_by_type[Government][0]
+    seller = model.agents_by_type[Seller][0]
+    pricing = model.mortgage_pricing
+    pricing.sync(model, government)
+    adults = np.flatnonzero(columns["age"] >= model.config.ADOLESCENCE_AGE)
+    if len(model.developer_houses) == 0:
+        model.buyers_want_home += len(adults)
+        return np.empty(0, dtype=np.int64)
+    adults = adults[model.streams.ordering.permutation(len(adults))]
+
+    by_price, by_age = model.developer_houses.queues()
+    informed = columns["is_informed"][adults]
+    quote = np.where(informed, model.houses.price[by_price[0]], model.houses.price[by_age[0]])
+    _, desired_amount, additional_consumption, _, _ = demand(model, columns, adults, quote)
+    wants = np.flatnonzero(desired_amount > columns["n_houses"][adults])
+    reservation = reservation_ranks(model, columns, adults[wants], model.houses.price[by_price])
+    seen, bought = match_orders(informed[wants], reservation, by_price, by_age)
+    if len(seen) < len(wants) or bought.sum() == len(by_price):
+        # Дома кончились: все после купившего последний дом остаются без покупки, как в Buyer.buy
+        last = wants[len(seen) - 1]
+        model.buyers_want_home += len(adults) - last - 1
+        adults, additional_consumption = adults[:last + 1], additional_consumption[:last + 1]
+        wants = wants[:len(seen)]
+
+    # Итоговый спрос - по цене дома, который агент увидел в свою очередь
+    price = model.houses.price[seen]
+    buying_type, _, seen_consumption, selected_mortgage_rate, mortgage_duration = demand(
+        model, columns, adults[wants], price)
+    additional_consumption[wants] = seen_consumption
+    grown = columns["age"][adults] > model.config.ADOLESCENCE_AGE
+    columns["additional_consumption"][adults[grown]] = additional_consumption[grown]
+
+    rows, houses, price = adults[wants][bought], seen[bought], price[bought]
+    buying_type = buying_type[bought]
+    selected_mortgage_rate, mortgage_duration = selected_mortgage_rate[bought], mortgage_duration[bought]
+
+    mortgage = buying_type == 'mortgage'
+    monthly_payment = pricing.payment_factors(
+        selected_mortgage_rate[mortgage], mortgage_duration[mortgage]) * price[mortgage] * 0.7
+    subsidized = (selected_mortgage_rate[mortgage] < model.mortgage_rate) | government.is_spending
+    full_payment = pricing.payment_factors(
+        selected_mortgage_rate[mortgage][subsidized], mortgage_duration[mortgage][subsidized],
+        government.mortgage_percent_help) * price[mortgage][subsidized] * 0.7
+    subsidy = ((full_payment - monthly_payment[subsidized]) * mortgage_duration[mortgage][subsidized]).sum()
+    government.money_reserve -= subsidy
+    model.program_spending += subsidy
+
+    columns["mortgage_monthly_payment"][rows[mortgage]] += monthly_payment
+    columns["wealth"][rows] -= np.where(mortgage, price * 0.3, price)  # Первоначальный взнос или вся цена
+    columns["n_houses"][rows] += 1
+    model.totals.houses += len(rows)
+    model.mortgages_bought += int(mortgage.sum())
+    model.cash_bought += int((~mortgage).sum())
+    model.mortgage_rates.extend(selected_mortgage_rate[mortgage].tolist())
+    for duration in mortgage_duration[mortgage].tolist():
+        model.mortgage_durations.append(duration)
+
+    model.houses.owner[houses] = columns["unique_id"][rows]
+    seller.houses_bought(price)
+    model.developer_houses.remove_many(houses)
+    return adults
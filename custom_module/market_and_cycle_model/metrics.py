@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+from .agents import Seller, Government
+from .aggregates import check_totals
+from .mortgage import annuity_factor
+
+# Колонки в том же порядке, что и в прежнем mesa.DataCollector
+METRICS_COLUMNS = {
+    "acquired_homes": np.int64,
+    "existing_homes": np.int64,
+    "demand": np.int64,
+    "sold_price": np.float64,
+    "start_price": np.float64,
+    "reserve": np.int64,
+    "alt_reserve": np.int64,
+    "produce": np.int64,
+    "sold": np.int64,
+    "population": np.int64,
+    "fertility": np.int64,
+    "average_age": np.float64,
+    "average_wealth": np.float64,
+    "highest_wealth": np.float64,
+    "lowest_wealth": np.float64,
+    "cash_bought": np.int64,
+    "mortgages_bought": np.int64,
+    "births": np.int64,
+    "deaths": np.int64,
+    "hai": np.float64,
+    "pir": np.float64,
+    "government_reserve": np.float64,
+    "taxes": np.float64,
+    "transferts": np.float64,
+    "program_spending": np.float64,
+}
+
+
+class MetricsRecorder:
+    # Замена mesa.DataCollector: показатели пишутся в заранее выделенные массивы.
+    # Численность, зарплаты, возраст, дети и дома берутся из model.totals, проход по
+    # покупателям нужен только для богатства (model.get_buyer_wealth()).
+    # snapshot_every=k дополнительно сохраняет колонки каждого агента раз в k шагов.
+    # check_totals=True - отладка: каждый шаг сверяет model.totals с полным пересчётом
+
+    def __init__(self, snapshot_every=None, capacity=256, check_totals=False):
+        self.snapshot_every = snapshot_every
+        self.check_totals = check_totals
+        self.n_steps = 0
+        self.start = 0  # Первый шаг, строки которого ещё в буфере (раньше отданы flush)
+        self.flushed_last = None  # Последняя строка, отданная flush, пока в буфере нет новых
+        self.columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in METRICS_COLUMNS.items()}
+        self.snapshots = []
+
+    def collect(self, model):
+        snapshot = self.snapshot_every and self.n_steps % self.snapshot_every == 0
+        buyers = model.get_buyer_columns() if snapshot or self.check_totals else None
+        if self.check_totals:
+            check_totals(model.totals, buyers)
+        row = self.n_steps - self.start
+        if row == len(self.columns["population"]):
+            for name, column in self.columns.items():
+                self.columns[name] = np.concatenate([column, np.empty_like(column)])
+        wealth = model.get_buyer_wealth() if buyers is None else buyers["wealth"]
+        for name, value in compute_metrics(model, wealth).items():
+            self.columns[name][row] = value
+        if snapshot:
+            snapshot = pd.DataFrame(buyers)
+            snapshot.insert(0, "Step", self.n_steps)
+            self.snapshots.append(snapshot)
+        self.n_steps += 1
+
+    def get_model_vars_dataframe(self):
+        return pd.DataFrame(
+            {name: column[:self.n_steps - self.start] for name, column in self.columns.items()},
+            index=pd.RangeIndex(self.start, self.n_steps))
+
+    def last(self, name):
+        # Значение показателя на последнем собранном шаге, None - если шагов ещё не было
+        if self.n_steps == self.start:
+            return None if self.flushed_last is None else self.flushed_last[name]
+        return self.columns[name][self.n_steps - self.start - 1].item()
+
+    def flush(self):
+        # Отдаёт показатели, собранные после прошлого flush, и освобождает буфер.
+        # Нужен для длинных прогонов, которые сразу пишут результаты на диск
+        frame = self.get_model_vars_dataframe().copy()
+        if len(frame) > 0:
+            self.flushed_last = {name: self.last(name) for name in self.columns}
+        self.start = self.n_steps
+        return frame
+
+    def get_agent_vars_dataframe(self):
+        # Снимки агентов с индексом (Step, AgentID), как у mesa.DataCollector
+        if not self.snapshots:
+            return pd.DataFrame()
+        return (pd.concat(self.snapshots, ignore_index=True)
+                .rename(columns={"unique_id": "AgentID"})
+                .set_index(["Step", "AgentID"]))
+
+
+def compute_metrics(model, wealth):
+    seller = model.agents_by_type[Seller][0]
+    government = model.agents_by_type[Government][0]
+    totals = model.totals
+    population = totals.population
+    average_wage = totals.average_wage()
+    return {
+        "acquired_homes": totals.houses,
+        "existing_homes": len(model.houses),
+        "demand": model.buyers_want_home,
+        # Здесь и далее индекс -2, потому что к моменту забора данных уже появились новые значения
+        "sold_price": seller.sold_price_history[-2],
+        "start_price": seller.start_price_history[-1],
+        "reserve": seller.reserve_history[-2],
+        # Дома, построенные на этом шаге, в резерв ещё не входят
+        "alt_reserve": len(model.developer_houses) - seller.produce_history[-1],
+        "produce": seller.produce_history[-2],
+        "sold": seller.sold_history[-2],
+        "population": population,
+        "fertility": totals.children,
+        "average_age": totals.average_age(),
+        "average_wealth": np.mean(wealth),
+        "highest_wealth": wealth.max(),
+        "lowest_wealth": wealth.min(),
+        "cash_bought": model.cash_bought,
+        "mortgages_bought": model.mortgages_bought,
+        "births": model.births,
+        "deaths": model.deaths,
+        "hai": compute_hai(model, average_wage, population),
+        "pir": compute_pir(model, average_wage, population),
+        "government_reserve": government.money_reserve,
+        "taxes": government.taxes,
+        "transferts": model.transfert_spending,
+        "program_spending": model.program_spending,
+    }
+
+
+def compute_pir(model, average_wage, population):
+    agent_income = average_wage + (model.transfert_spending/population)
+    price = model.agents_by_type[Seller][0].sold_price_history[-2]
+    return price / (12 * agent_income)
+
+
+def compute_hai(model, average_wage, population):
+    agent_income = average_wage + (model.transfert_spending/population)
+    price = model.agents_by_type[Seller][0].sold_price_history[-2]
+    avg_mortgage_rate = np.mean(model.mortgage_rates)
+    monthly_mortgage_rate = avg_mortgage_rate/12
+    mortgage_duration_avg = model.mortgage_durations.mean()
+    # Средний срок дробный, поэтому без таблиц MortgagePricing
+    mortgage_overpay_ratio = annuity_factor(monthly_mortgage_rate, mortgage_duration_avg) * mortgage_duration_avg
+    return agent_income / ((1/0.35)*0.7*price*mortgage_overpay_ratio/mortgage_duration_avg)
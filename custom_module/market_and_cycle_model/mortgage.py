@@ -0,0 +1,78 @@
+import numpy as np
+
+
+def monthly_rate(annual_rate):
+    return (1 + annual_rate) ** (1/12) - 1
+
+
+def subsidized_monthly_rate(monthly_mortgage_rate, percent_help):
+    # Полная ставка, если государство доплачивает банку percent_help годовых
+    return (percent_help + (1+monthly_mortgage_rate)**12) ** (1/12) - 1
+
+
+def annuity_factor(monthly_mortgage_rate, duration):
+    # Ежемесячный платёж на рубль кредита
+    return monthly_mortgage_rate + (monthly_mortgage_rate / ((1+monthly_mortgage_rate)**(duration) - 1))
+
+
+class MortgagePricing:
+    # Аннуитетные коэффициенты и коэффициенты переплаты, посчитанные заранее для всех сроков.
+    # Ставок в модели несколько (обычная, молодёжная, семейная, с господдержкой), поэтому
+    # на каждую ставку строится одна таблица по срокам 1..max_duration.
+    # sync() сбрасывает таблицы, когда у модели меняются ставки или господдержка
+
+    def __init__(self, config):
+        # Самый долгий срок ипотеки: OLD_AGE - возраст + 1 для самого молодого покупателя
+        self.max_duration = config.OLD_AGE - config.ADOLESCENCE_AGE + 1
+        self.rates = None
+        self.monthly_rates = {}  # (годовая ставка, господдержка) -> месячная ставка
+        self.tables = {}  # месячная ставка -> (аннуитетный коэффициент, коэффициент переплаты) по срокам
+
+    def sync(self, model, government):
+        rates = (model.mortgage_rate, model.youth_mortgage_rate, model.family_mortgage_rate,
+                 government.mortgage_percent_help)
+        if rates != self.rates:
+            self.rates = rates
+            self.monthly_rates = {}
+            self.tables = {}
+
+    def monthly_rate(self, annual_rate, percent_help=None):
+        key = (annual_rate, percent_help)
+        rate = self.monthly_rates.get(key)
+        if rate is None:
+            rate = monthly_rate(annual_rate)
+            if percent_help is not None:
+                rate = subsidized_monthly_rate(rate, percent_help)
+            self.monthly_rates[key] = rate
+        return rate
+
+    def table(self, annual_rate, percent_help=None):
+        rate = self.monthly_rate(annual_rate, percent_help)
+        table = self.tables.get(rate)
+        if table is None:
+            # Скалярно, как в прежних формулах: векторный np.power может отличаться в последнем знаке
+            factors = np.array([np.nan] + [annuity_factor(float(rate), n) for n in range(1, self.max_duration + 1)])
+            table = self.tables[rate] = (factors, factors * np.arange(self.max_duration + 1))
+        return table
+
+    def payment_factor(self, annual_rate, duration, percent_help=None):
+        return self.table(annual_rate, percent_help)[0][duration]
+
+    def payment_factors(self, annual_rates, durations, percent_help=None):
+        # payment_factor для массивов ставок и сроков
+        return self._lookup(0, annual_rates, durations, percent_help)
+
+    def overpay_ratio(self, annual_rate, duration):
+        return self.table(annual_rate)[1][duration]
+
+    def overpay_ratios(self, annual_rates, durations):
+        # overpay_ratio для массивов ставок и сроков
+        return self._lookup(1, annual_rates, durations)
+
+    def _lookup(self, column, annual_rates, durations, percent_help=None):
+        annual_rates = np.broadcast_to(annual_rates, np.shape(durations))
+        values = np.empty(np.shape(durations))
+        for annual_rate in np.unique(annual_rates):
+            same_rate = annual_rates == annual_rate
+            values[same_rate] = self.table(float(annual_rate), percent_help)[column][durations[same_rate]]
+        return values
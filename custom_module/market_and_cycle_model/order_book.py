@@ -0,0 +1,71 @@
+import heapq
+import numpy as np
+
+
+class HouseOrderBook:
+    # Непроданные дома застройщика. Обновляется по ходу модели, а не пересобирается каждый шаг:
+    # куча по цене для информированных покупателей и куча по порядку постройки для остальных.
+    # Дома - номера строк в HouseStore, цены берутся оттуда.
+    # Устаревшие записи куч (проданные дома, старые цены) удаляются лениво при чтении
+
+    def __init__(self, store):
+        self.store = store
+        self.houses = {}  # номер дома -> None в порядке постройки
+        self.by_price = []  # (цена, номер дома)
+        self.by_age = []  # номер дома
+
+    def __len__(self):
+        return len(self.houses)
+
+    def __iter__(self):
+        return iter(list(self.houses))
+
+    def ids(self):
+        return np.fromiter(self.houses, dtype=np.int64, count=len(self.houses))
+
+    def add(self, ids):
+        for house, price in zip(ids.tolist(), self.store.price[ids].tolist()):
+            self.houses[house] = None
+            heapq.heappush(self.by_price, (price, house))
+            heapq.heappush(self.by_age, house)
+
+    def remove(self, house):
+        del self.houses[house]
+
+    def remove_many(self, ids):
+        for house in ids.tolist():
+            del self.houses[house]
+
+    def queues(self):
+        # Очереди целиком: дома по возрастанию цены (при равной цене - по номеру) и по порядку постройки
+        ids = self.ids()
+        return ids[np.lexsort((ids, self.store.price[ids]))], np.sort(ids)
+
+    def update_prices(self, ids):
+        # Дома подешевели - добавляем записи с новыми ценами, старые станут недействительными
+        for house, price in zip(ids.tolist(), self.store.price[ids].tolist()):
+            heapq.heappush(self.by_price, (price, house))
+        if len(self.by_price) > 2 * len(self.houses) + 64:
+            ids = self.ids()
+            self.by_price = list(zip(self.store.price[ids].tolist(), ids.tolist()))
+            heapq.heapify(self.by_price)
+
+    def cheapest(self):
+        while self.by_price:
+            price, house = self.by_price[0]
+            if house in self.houses and self.store.price[house] == price:
+                return house
+            heapq.heappop(self.by_price)
+        return None
+
+    def oldest(self):
+        while self.by_age:
+            house = self.by_age[0]
+            if house in self.houses:
+                return house
+            heapq.heappop(self.by_age)
+        return None
+
+    def add_month_without_buyer(self):
+        # HouseStore.add_month_without_buyer для всех домов застройщика
+        self.update_prices(self.store.add_month_without_buyer(self.ids()))
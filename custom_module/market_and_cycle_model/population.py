@@ -0,0 +1,212 @@
+import numpy as np
+from .aggregates import PopulationTotals
+from .lineage import sibling_rank
+
+
+def sample_wages(rng, config, n):
+    # Зарплаты для n агентов разом: сначала группа дохода (WAGE_BANDS_* из config), потом значение внутри группы
+    low = np.asarray(config.WAGE_BANDS_LOW)
+    width = np.asarray(config.WAGE_BANDS_WIDTH)
+    band = rng.choice(len(config.WAGE_BANDS_P), size=n, p=config.WAGE_BANDS_P)
+    wages = np.empty(n)
+    tail = band == len(low)
+    body = ~tail
+    wages[body] = rng.random(body.sum()) * width[band[body]] + low[band[body]]
+    wages[tail] = (rng.chisquare(2, size=tail.sum()) + 1) * config.WAGE_TAIL
+    return wages
+
+
+def sample_children(rng, n):
+    return rng.choice([0, 1, 2], size=n, p=[0.7, 0.2, 0.1])
+
+
+def sample_informed(rng, n):
+    return rng.random(n) < 0.5
+
+
+def sample_ages(rng, config, n):
+    return rng.integers(config.ADOLESCENCE_AGE, config.OLD_AGE, size=n)
+
+
+def sample_buyers(streams, config, n, age=-1, n_children=-1):
+    # Все случайные характеристики n покупателей разом (streams - RandomStreams модели, config - её параметры).
+    # age и n_children - число или массив; -1 означает, что значение разыгрывается
+    if np.isscalar(age) and age == -1:
+        age = sample_ages(streams.demography, config, n)
+    if np.isscalar(n_children) and n_children == -1:
+        n_children = sample_children(streams.demography, n)
+    return {
+        'age': np.broadcast_to(age, n).copy(),
+        'n_children': np.broadcast_to(n_children, n).copy(),
+        'wage': sample_wages(streams.wages, config, n),
+        'is_informed': sample_informed(streams.demography, n),
+    }
+
+
+class BuyerPopulation:
+    # Все покупатели в виде колонок NumPy, одна строка - одно домохозяйство.
+    # Строки всегда упорядочены по unique_id (порядок создания), как и агенты в AgentSet
+    COLUMNS = ('unique_id', 'parent', 'age', 'wage', 'wealth', 'n_children', 'n_houses',
+               'mortgage_monthly_payment', 'additional_consumption', 'will_to_buy', 'is_informed')
+    # Что домохозяйство забирает с собой при переезде в другой регион
+    MIGRANT_COLUMNS = ('age', 'wage', 'wealth', 'mortgage_monthly_payment', 'additional_consumption',
+                       'will_to_buy', 'is_informed')
+
+    def __init__(self, streams, config):
+        self.streams = streams
+        self.config = config
+        self.totals = PopulationTotals()  # Суммы по строкам для показателей
+        self.next_id = 0
+        self.unique_id = np.empty(0, dtype=np.int64)
+        self.parent = np.empty(0, dtype=np.int64)  # -1, если родителя нет
+        self.age = np.empty(0, dtype=np.int64)
+        self.wage = np.empty(0)
+        self.wealth = np.empty(0)
+        self.n_children = np.empty(0, dtype=np.int64)
+        self.n_houses = np.empty(0, dtype=np.int64)
+        self.mortgage_monthly_payment = np.empty(0)
+        self.additional_consumption = np.empty(0)
+        self.will_to_buy = np.empty(0)
+        self.is_informed = np.empty(0, dtype=bool)
+
+    def __len__(self):
+        return len(self.unique_id)
+
+    def add(self, n, age=-1, n_children=0, parent=-1, wealth=0.0):
+        # Аналог Buyer.create_agents: age, n_children, parent - число или массив длины n
+        traits = sample_buyers(self.streams, self.config, n, age=age, n_children=n_children)
+        self.totals.add(traits['wage'], traits['age'], traits['n_children'])
+        ids = np.arange(self.next_id, self.next_id + n, dtype=np.int64)
+        self.next_id += n
+        self.unique_id = np.concatenate([self.unique_id, ids])
+        self.parent = np.concatenate([self.parent, np.broadcast_to(parent, n)])
+        self.age = np.concatenate([self.age, traits['age']])
+        self.wage = np.concatenate([self.wage, traits['wage']])
+        self.wealth = np.concatenate([self.wealth, np.broadcast_to(wealth, n)])
+        self.n_children = np.concatenate([self.n_children, traits['n_children']])
+        self.n_houses = np.concatenate([self.n_houses, np.zeros(n, dtype=np.int64)])
+        self.mortgage_monthly_payment = np.concatenate([self.mortgage_monthly_payment, np.zeros(n)])
+        self.additional_consumption = np.concatenate([self.additional_consumption, np.zeros(n)])
+        self.will_to_buy = np.concatenate([self.will_to_buy, np.zeros(n)])
+        self.is_informed = np.concatenate([self.is_informed, traits['is_informed']])
+        return ids
+
+    def keep(self, mask):
+        # Оставляем только строки из mask (после смертей)
+        gone = ~mask
+        self.totals.remove(self.wage[gone], self.age[gone], self.n_children[gone], self.n_houses[gone])
+        for name in self.COLUMNS:
+            setattr(self, name, getattr(self, name)[mask])
+
+    def emigrate(self, rate):
+        # Каждое взрослое бездетное домохозяйство без жилья уезжает с вероятностью rate.
+        # Возвращает колонки MIGRANT_COLUMNS уехавших, их строки удаляются
+        movable = (self.age > self.config.ADOLESCENCE_AGE) & (self.n_children == 0) & (self.n_houses == 0)
+        leaving = movable & (self.streams.demography.random(len(self)) < rate)
+        migrants = {name: getattr(self, name)[leaving] for name in self.MIGRANT_COLUMNS}
+        self.keep(~leaving)
+        return migrants
+
+    def immigrate(self, migrants):
+        # Приезжие получают новые unique_id и начинают без детей и жилья
+        n = len(migrants['age'])
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+        ids = np.arange(self.next_id, self.next_id + n, dtype=np.int64)
+        self.next_id += n
+        new_rows = {
+            'unique_id': ids,
+            'parent': np.full(n, -1, dtype=np.int64),
+            'n_children': np.zeros(n, dtype=np.int64),
+            'n_houses': np.zeros(n, dtype=np.int64),
+            **migrants,
+        }
+        self.totals.add(new_rows['wage'], new_rows['age'], 0)
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            setattr(self, name, np.concatenate([column, np.asarray(new_rows[name], dtype=column.dtype)]))
+        return ids
+
+    def rows_of(self, ids):
+        # unique_id отсортированы, поэтому строку можно найти бинарным поиском
+        return np.searchsorted(self.unique_id, ids)
+
+    def generate_kids(self):
+        # Генерируем детей при первичном прогоне: у всех детей одного родителя общий возраст
+        parents = np.flatnonzero(self.n_children > 0)
+        kids_age = self.streams.demography.integers(0, self.config.ADOLESCENCE_AGE, size=len(parents))
+        counts = self.n_children[parents]
+        self.add(
+            counts.sum(),
+            age=np.repeat(kids_age, counts),
+            parent=np.repeat(self.unique_id[parents], counts))
+
+    def generate_wealth(self):
+        # Генерируем накопленное богатство при первичном прогоне
+        self.wealth = self.streams.wages.random(len(self)) * self.config.WEALTH_MULTIPLIER - self.config.WEALTH_DIMINISHER
+
+    def change_state(self, government, houses):
+        # То же, что Buyer.change_state и WorldModel.settle_estates для всех агентов разом
+        # (houses - HouseStore модели, владельцы домов умерших переписываются в нём).
+        # Возвращает (births, deaths)
+        config = self.config
+        adults = self.age > config.ADOLESCENCE_AGE
+        # В Buyer.change_state строки с AUTONOMOUS_CONSUMPTION и платежом по ипотеке
+        # не входят в выражение, поэтому в доход идёт только зарплата после налога
+        disposable_income = self.wage[adults] * (1 - config.INCOME_TAX)
+        government.taxes += (self.wage[adults] * config.INCOME_TAX).sum()
+        self.wealth[adults] += disposable_income - self.additional_consumption[adults]
+
+        fertile = adults & (self.age < config.CLIMAX_AGE)
+        newborn = fertile & (self.streams.demography.random(len(self)) < 0.004)
+        self.n_children += newborn
+        self.totals.children += int(newborn.sum())
+        self.will_to_buy += (self.n_children + 1) / (self.n_houses + 1)
+
+        # Старение и смерть
+        dead = self.age >= config.OLD_AGE
+        self.age[~dead] += 1
+        self.totals.age += len(self) - int(dead.sum())
+        self.settle_estates(dead, government, houses)
+
+        parents = self.unique_id[newborn]
+        self.keep(~dead)
+        self.add(len(parents), age=0, parent=parents)
+        return len(parents), int(dead.sum())
+
+    def settle_estates(self, dead, government, houses):
+        # Делим наследство умерших между живыми детьми, как WorldModel.settle_estates.
+        # Доля делится на всех когда-либо рождённых детей (n_children), а дома раздаются
+        # по порядку рождения: первые houses % n_children детей получают на один дом больше.
+        # Наследство бездетных уходит государству
+        if not dead.any():
+            return
+        # Дома всех умерших - один запрос к HouseStore: дома строки dead_rows[i] - ids[offsets[i]:offsets[i + 1]]
+        dead_rows = np.flatnonzero(dead)
+        ids, offsets = houses.houses_of(self.unique_id[dead_rows])
+        heirless = dead & (self.n_children == 0)
+        if heirless.any():
+            owner_index = np.repeat(np.arange(len(dead_rows)), np.diff(offsets))
+            government.get_lost_inheritance(
+                houses=ids[heirless[dead_rows][owner_index]], wealth=self.wealth[heirless].sum())
+
+        is_heir = ~dead & (self.parent >= 0)
+        is_heir[is_heir] = np.isin(self.parent[is_heir], self.unique_id[dead])
+        heirs = np.flatnonzero(is_heir)
+        if len(heirs) == 0:
+            return
+        estate = self.rows_of(self.parent[heirs])
+        rank = sibling_rank(estate)
+
+        n_kids = self.n_children[estate]
+        share, extra = self.n_houses[estate] // n_kids, self.n_houses[estate] % n_kids
+        self.wealth[heirs] += self.wealth[estate] / n_kids
+        inherited = share + (rank < extra)
+        self.n_houses[heirs] += inherited
+        self.totals.houses += int(inherited.sum())
+
+        # Дома каждого умершего идут по порядку постройки: наследник с номером rank
+        # получает inherited[i] домов начиная с rank * share + min(rank, extra)
+        start = offsets[np.searchsorted(dead_rows, estate)] + rank * share + np.minimum(rank, extra)
+        within = np.arange(inherited.sum()) - np.repeat(np.cumsum(inherited) - inherited, inherited)
+        houses.owner[ids[np.repeat(start, inherited) + within]] = np.repeat(self.unique_id[heirs], inherited)
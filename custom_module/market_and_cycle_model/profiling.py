@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+from time import perf_counter
+
+# Сколько вызовов делает фаза: по одному на каждого покупателя, на каждый дом застройщика
+# или один вызов на всю фазу. Модель может задать своё соответствие атрибутом PHASE_CALLS
+PHASE_CALLS = {
+    "change_state": "buyers",
+    "buy": "buyers",
+    "reprice_houses": "developer_houses",
+}
+
+
+class StepProfiler:
+    # Замер фаз шага модели: WorldModel(..., profiler=StepProfiler()).
+    # На каждом шаге пишет время и число вызовов каждой фазы из model.STEP_PHASES,
+    # число агентов после шага, рождения, смерти и построенные дома.
+    # Без профайлера шаг модели идёт по обычному пути без замеров
+
+    def __init__(self):
+        self.rows = []
+
+    def count_agents(self, model):
+        return {
+            "buyers": model.count_buyers(),
+            "houses": len(model.houses),
+            "developer_houses": len(model.developer_houses),
+        }
+
+    def run_step(self, model):
+        # Номер шага совпадает с индексом таблицы datacollector
+        row = {"step": len(self.rows)}
+        counts = self.count_agents(model)
+        houses_before = counts["houses"]
+        started = perf_counter()
+        phase_calls = getattr(model, "PHASE_CALLS", PHASE_CALLS)
+        for phase in model.STEP_PHASES:
+            calls = counts.get(phase_calls.get(phase), 1)
+            phase_started = perf_counter()
+            getattr(model, phase)()
+            row[phase + "_seconds"] = perf_counter() - phase_started
+            row[phase + "_calls"] = calls
+            counts = self.count_agents(model)
+        row["step_seconds"] = perf_counter() - started
+        row.update(counts)
+        row["births"] = model.births
+        row["deaths"] = model.deaths
+        row["new_houses"] = counts["houses"] - houses_before
+        self.rows.append(row)
+
+    def get_step_dataframe(self):
+        # Одна строка на шаг, индекс - номер шага, как у datacollector
+        if not self.rows:
+            return pd.DataFrame()
+        return pd.DataFrame(self.rows).set_index("step")
+
+    def slowest_phases(self, top=3):
+        # Фазы с наибольшей долей времени по каждому шагу - чтобы быстро найти, где вырос шаг
+        frame = self.get_step_dataframe()
+        seconds = frame.filter(like="_seconds").drop(columns="step_seconds")
+        seconds.columns = [column[:-len("_seconds")] for column in seconds.columns]
+        order = np.argsort(-seconds.to_numpy(), axis=1)[:, :top]
+        return pd.DataFrame(seconds.columns.to_numpy()[order], index=frame.index)
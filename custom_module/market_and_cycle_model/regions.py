@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+from multiprocessing import get_context
+from .agents import Government
+from .config import DEFAULT_CONFIG, make_config
+from .scenario import BASE_POLICY, apply_policy, create_model
+
+# Доля взрослых бездетных домохозяйств без жилья, переезжающих за месяц
+MIGRATION_RATE = 0.001
+
+# Пример описания регионов:
+# {
+#     "moscow": {"num_buyers": 120000, "seed": 1, "wage_scale": 2.1, "settings": {"PRICE_START": 12 * 10**6}},
+#     "tatarstan": {"num_buyers": 40000, "seed": 2},
+# }
+# wage_scale умножает распределение зарплат, settings переопределяет параметры settings.py для региона
+DEFAULT_REGION = {
+    "num_buyers": 10000,
+    "seed": None,
+    "wage_scale": 1.0,
+    "settings": {},
+}
+
+
+def region_config(region):
+    # Параметры модели региона (config.ModelConfig)
+    scale = region["wage_scale"]
+    return make_config({
+        "WAGE_BANDS_LOW": tuple(low * scale for low in DEFAULT_CONFIG.WAGE_BANDS_LOW),
+        "WAGE_BANDS_WIDTH": tuple(width * scale for width in DEFAULT_CONFIG.WAGE_BANDS_WIDTH),
+        "WAGE_TAIL": DEFAULT_CONFIG.WAGE_TAIL * scale,
+        **region["settings"],
+    })
+
+
+def region_worker(connection, region, policy):
+    # Процесс одного региона: своё население, свой застройщик и жильё, своё государство.
+    # На каждое сообщение координатора делает один шаг и отвечает короткой сводкой.
+    # None вместо сообщения - конец прогона, в ответ уходят все показатели региона
+    model = create_model(
+        num_buyers=region["num_buyers"], seed=region["seed"], policy=policy, engine='vector',
+        config=region_config(region))
+    government = model.agents_by_type[Government][0]
+    while True:
+        message = connection.recv()
+        if message is None:
+            connection.send(model.datacollector.get_model_vars_dataframe())
+            return
+        if message["taxes"] is not None:
+            government.taxes = message["taxes"]
+        model.population.immigrate(message["immigrants"])
+        model.step()
+        apply_policy(model, message["policy"])
+        emigrants = model.population.emigrate(message["migration_rate"])
+        connection.send({
+            "population": len(model.population),
+            "pir": model.datacollector.last("pir"),
+            "taxes": government.taxes,
+            "transferts": model.transfert_spending,
+            "program_spending": model.program_spending,
+            "emigrants": emigrants,
+        })
+
+
+def route_migrants(reports, regions, rng):
+    # Уехавшие выбирают регион с вероятностью, пропорциональной населению, делённому на КДЖ:
+    # люди едут в большие рынки, где жильё доступнее. Зарплата пересчитывается по уровню региона
+    names = list(regions)
+    weights = np.array([reports[name]["population"] / reports[name]["pir"] for name in names])
+    weights[~np.isfinite(weights)] = 0
+    arrivals = {name: [] for name in names}
+    for origin, name in enumerate(names):
+        emigrants = reports[name]["emigrants"]
+        n = len(emigrants["age"])
+        if n == 0:
+            continue
+        destination_weights = weights.copy()
+        destination_weights[origin] = 0
+        if destination_weights.sum() <= 0:
+            continue
+        destinations = rng.choice(len(names), size=n, p=destination_weights / destination_weights.sum())
+        for target in np.unique(destinations):
+            moving = destinations == target
+            migrants = {column: values[moving] for column, values in emigrants.items()}
+            migrants["wage"] = migrants["wage"] * regions[names[target]]["wage_scale"] / regions[name]["wage_scale"]
+            arrivals[names[target]].append(migrants)
+    return {
+        name: {column: np.concatenate([migrants[column] for migrants in arrived])
+               for column in arrived[0]} if arrived else {"age": np.empty(0)}
+        for name, arrived in arrivals.items()}
+
+
+def run_regions(regions, months, events=None, policy=BASE_POLICY, migration_rate=MIGRATION_RATE,
+                pool_taxes=False, seed=None):
+    # Многорегиональная модель: каждый регион шагает в своём процессе, после каждого месяца
+    # все регионы встречаются у барьера координатора. Между процессами ходят только сводки:
+    # переезжающие домохозяйства, налоги и расходы регионов, общая ставка ЦБ и политика (events).
+    # pool_taxes=True - налоги всех регионов складываются в общий бюджет и делятся по населению.
+    # Возвращает таблицу region, step и все показатели каждого региона
+    regions = {name: {**DEFAULT_REGION, **region} for name, region in regions.items()}
+    events = events or {}
+    rng = np.random.default_rng(seed)
+    context = get_context("spawn")
+    connections = {}
+    processes = []
+    for name, region in regions.items():
+        connection, child = context.Pipe()
+        process = context.Process(target=region_worker, args=(child, region, policy), daemon=True)
+        process.start()
+        connections[name] = connection
+        processes.append(process)
+
+    try:
+        immigrants = {name: {"age": np.empty(0)} for name in regions}
+        taxes = {name: None for name in regions}
+        national = []
+        for month in range(months):
+            for name, connection in connections.items():
+                connection.send({
+                    "policy": events.get(month, {}),
+                    "migration_rate": migration_rate,
+                    "immigrants": immigrants[name],
+                    "taxes": taxes[name],
+                })
+            # Барьер: следующий месяц начинается, когда ответили все регионы
+            reports = {name: connection.recv() for name, connection in connections.items()}
+            immigrants = route_migrants(reports, regions, rng)
+            total_taxes = sum(report["taxes"] for report in reports.values())
+            if pool_taxes:
+                total_population = sum(report["population"] for report in reports.values())
+                taxes = {
+                    name: total_taxes * report["population"] / total_population
+                    for name, report in reports.items()}
+            national.append({
+                "step": month,
+                "national_taxes": total_taxes,
+                "national_transferts": sum(report["transferts"] for report in reports.values()),
+                "national_program_spending": sum(report["program_spending"] for report in reports.values()),
+                "migrants": sum(len(report["emigrants"]["age"]) for report in reports.values()),
+            })
+
+        frames = []
+        for name, connection in connections.items():
+            connection.send(None)
+            result = connection.recv().rename_axis("step").reset_index()
+            result.insert(0, "region", name)
+            frames.append(result)
+    finally:
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+    return pd.concat(frames, ignore_index=True).merge(pd.DataFrame(national), on="step")
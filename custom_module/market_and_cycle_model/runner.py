@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import pandas as pd
+from pathlib import Path
+from .config import make_config
+from .scenario import BASE_POLICY, SCENARIOS, apply_policy, create_model
+
+# Через сколько месяцев показатели сбрасываются на диск
+CHUNK_MONTHS = 12
+
+# Пример файла сценария:
+# {
+#     "num_buyers": 10000,
+#     "months": 300,
+#     "seed": 1,
+#     "engine": "object",
+#     "scenario": "govhelp",
+#     "events": {"162": {"mortgage_rate": 0.08, "government.is_spending": true}},
+#     "settings": {"FIRST_PRICE_MULT": 1.2}
+# }
+# scenario - имя из SCENARIOS, events дополняют и переопределяют его события,
+# settings переопределяет параметры settings.py (config.make_config).
+# "policy": {..., "market_clearing": "batch"} включает пакетный клиринг рынка (market.py)
+
+# Параметры прогона по умолчанию. Не путать с config.DEFAULT_CONFIG - параметрами самой модели
+DEFAULT_RUN_OPTIONS = {
+    "num_buyers": 10000,
+    "months": 200,
+    "seed": None,
+    "engine": "object",
+    "policy": BASE_POLICY,
+    "scenario": "base",
+    "events": {},
+    "settings": {},
+    "chunk_months": CHUNK_MONTHS,
+}
+
+
+def load_config(path):
+    config = {**DEFAULT_RUN_OPTIONS, **json.loads(Path(path).read_text())}
+    unknown = set(config) - set(DEFAULT_RUN_OPTIONS)
+    if unknown:
+        raise ValueError('Unknown config keys: {}'.format(', '.join(sorted(unknown))))
+    # В JSON ключи - строки, месяцы событий приводим к числам
+    events = {month: dict(policy) for month, policy in SCENARIOS[config["scenario"]].items()}
+    for month, policy in config["events"].items():
+        events.setdefault(int(month), {}).update(policy)
+    config["events"] = events
+    return config
+
+
+def write_chunk(frame, directory):
+    # Каждый кусок - отдельный файл, который появляется под своим именем только целиком,
+    # поэтому после падения прогона все записанные месяцы остаются читаемыми.
+    # Parquet, если установлен pyarrow, иначе CSV
+    try:
+        import pyarrow  # noqa: F401
+        suffix = '.parquet'
+    except ImportError:
+        suffix = '.csv'
+    path = Path(directory) / 'part-{:06d}{}'.format(frame.index[0], suffix)
+    temporary = path.with_name(path.name + '.tmp')
+    frame = frame.rename_axis("step").reset_index()
+    if suffix == '.parquet':
+        frame.to_parquet(temporary, index=False)
+    else:
+        frame.to_csv(temporary, index=False)
+    os.replace(temporary, path)
+    return path
+
+
+def read_results(directory):
+    # Собирает куски прогона в одну таблицу с индексом step
+    parts = sorted(Path(directory).glob('part-*'))
+    parts = [part for part in parts if part.suffix in ('.parquet', '.csv')]
+    if not parts:
+        return pd.DataFrame()
+    frames = [
+        pd.read_parquet(part) if part.suffix == '.parquet' else pd.read_csv(part, float_precision='round_trip')
+        for part in parts]
+    return pd.concat(frames, ignore_index=True).set_index("step")
+
+
+def run_batch(config, directory):
+    directory = Path(directory)
+    if any(directory.glob('part-*')):
+        raise FileExistsError('{} already contains results'.format(directory))
+    # Модель строится до записи на диск: неверные settings или policy не оставляют
+    # полупустую папку прогона
+    model = create_model(
+        num_buyers=config["num_buyers"], seed=config["seed"], policy=config["policy"], engine=config["engine"],
+        config=make_config(config["settings"]))
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / 'config.json').write_text(json.dumps(config, indent=2, default=str))
+
+    events = config["events"]
+    for month in range(config["months"]):
+        model.step()
+        if month in events:
+            apply_policy(model, events[month])
+        if (month + 1) % config["chunk_months"] == 0 or month + 1 == config["months"]:
+            write_chunk(model.datacollector.flush(), directory)
+    return model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m custom_module.market_and_cycle_model',
+        description='Run a market_and_cycle_model scenario and stream monthly metrics to disk')
+    parser.add_argument('config', help='JSON scenario file')
+    parser.add_argument('output', help='directory for the result chunks')
+    parser.add_argument('--months', type=int, help='override the number of months')
+    parser.add_argument('--seed', type=int, help='override the seed')
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    if args.months is not None:
+        config["months"] = args.months
+    if args.seed is not None:
+        config["seed"] = args.seed
+    run_batch(config, args.output)
@@ -0,0 +1,64 @@
+from .agents import Government
+from .config import DEFAULT_CONFIG
+from .vector_world import VectorWorldModel
+from .world import WorldModel
+
+ENGINES = {
+    'object': WorldModel,
+    'vector': VectorWorldModel,
+}
+
+# Начальные ставки, которые выставляются во всех ноутбуках
+BASE_POLICY = {
+    "mortgage_rate": 0.1,
+    "youth_mortgage_rate": 0.1,
+    "family_mortgage_rate": 0.1,
+}
+
+# Сценарии из ноутбуков: месяц -> изменения политики, применяемые после шага этого месяца.
+# Ключ "government.<атрибут>" меняет атрибут агента Government, остальные - атрибуты модели
+SCENARIOS = {
+    "base": {},
+    "govhelp": {
+        162: {"mortgage_rate": 0.08, "government.is_spending": True, "government.mortgage_percent_help": 0.02},
+    },
+    "youth_mortgage": {
+        162: {"youth_mortgage_rate": 0.06, "government.mortgage_percent_help": 0.02},
+    },
+    "redistribution": {
+        161: {"government.taxes": 0, "government.redistribution_mode": True},
+    },
+}
+
+
+def apply_policy(model, policy):
+    government = model.agents_by_type[Government][0]
+    for key, value in policy.items():
+        if key.startswith("government."):
+            setattr(government, key[len("government."):], value)
+        else:
+            setattr(model, key, value)
+
+
+def create_model(num_buyers=10000, seed=None, policy=BASE_POLICY, engine='object', profiler=None,
+                 config=DEFAULT_CONFIG):
+    model = ENGINES[engine](num_buyers=num_buyers, seed=seed, profiler=profiler, config=config)
+    apply_policy(model, policy)
+    return model
+
+
+def run_model(model, months, events=None, start=0):
+    # Шаги с месяца start до months, события применяются после шага своего месяца
+    events = events or {}
+    for month in range(start, months):
+        model.step()
+        if month in events:
+            apply_policy(model, events[month])
+    return model
+
+
+def run_scenario(events=None, months=200, num_buyers=10000, seed=None, policy=BASE_POLICY, engine='object',
+                 config=DEFAULT_CONFIG):
+    model = create_model(num_buyers=num_buyers, seed=seed, policy=policy, engine=engine, config=config)
+    run_model(model, months, events)
+    return model.datacollector.get_model_vars_dataframe()
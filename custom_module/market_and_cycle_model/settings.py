@@ -8,6 +8,12 @@ OLD_AGE = 840
 CLIMAX_AGE = 600
 ADOLESCENCE_AGE = 216
 YOUTH_AGE = 300
+# Интервальные группы доходов из https://rosstat.gov.ru/folder/13397 "Распределение населения по
+# интервальным группам среднедушевых денежных доходов". Последняя группа - хвост, (chisquare(2) + 1) * WAGE_TAIL
+WAGE_BANDS_LOW = (5000, 10000, 14000, 19000, 27000, 45000, 60000, 75000)
+WAGE_BANDS_WIDTH = (5000, 4000, 5000, 8000, 18000, 15000, 15000, 15000)
+WAGE_BANDS_P = (0.032, 0.047, 0.078, 0.138, 0.262, 0.144, 0.094, 0.091, 0.114)
+WAGE_TAIL = 100000
 
 # Sellers
 FORECAST_HORIZON = 36
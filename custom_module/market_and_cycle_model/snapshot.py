@@ -0,0 +1,55 @@
+import gzip
+import itertools
+import pickle
+import mesa
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from .scenario import run_model
+
+
+def save_snapshot(model, path):
+    # Модель целиком: агенты, генераторы модели (model.streams), истории продавца,
+    # бюджеты государства и собранные показатели.
+    # Счётчик unique_id агентов mesa хранится в классе Agent, а не в модели
+    next_agent_id = next(mesa.Agent._ids[model])
+    mesa.Agent._ids[model] = itertools.count(next_agent_id)
+    with gzip.open(path, 'wb', compresslevel=1) as file:
+        pickle.dump(
+            {
+                'model': model,
+                'next_agent_id': next_agent_id,
+            },
+            file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_snapshot(path):
+    with gzip.open(path, 'rb') as file:
+        snapshot = pickle.load(file)
+    model = snapshot['model']
+    mesa.Agent._ids[model] = itertools.count(snapshot['next_agent_id'])
+    return model
+
+
+def run_fork(path, events, months):
+    # Продолжаем модель из снимка с того месяца, на котором она была сохранена
+    model = load_snapshot(path)
+    run_model(model, months, events, start=model.steps)
+    return model.datacollector.get_model_vars_dataframe()
+
+
+def fork_scenarios(path, scenarios, months, processes=None):
+    # Запускает сценарии (имя -> события) из одного прогретого состояния.
+    # processes=0 - по очереди в текущем процессе, иначе в пуле процессов.
+    # В таблице есть и месяцы прогрева, сохранённые в снимке
+    if processes == 0:
+        results = [run_fork(path, events, months) for events in scenarios.values()]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [pool.submit(run_fork, path, events, months) for events in scenarios.values()]
+            results = [future.result() for future in futures]
+    frames = []
+    for name, result in zip(scenarios, results):
+        result = result.rename_axis("step").reset_index()
+        result.insert(0, "scenario", name)
+        frames.append(result)
+    return pd.concat(frames, ignore_index=True)
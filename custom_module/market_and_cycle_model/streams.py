@@ -0,0 +1,40 @@
+import numpy as np
+
+# Подсистемы модели, у каждой свой поток случайных чисел
+STREAMS = ("demography", "wages", "pricing", "developer", "ordering")
+
+
+class RandomStreams:
+    # Генераторы модели, порождённые из одного зерна через SeedSequence.spawn.
+    # Philox - счётный генератор: потоки независимы, поэтому порядок обращений одной
+    # подсистемы не сдвигает числа другой, а процессы не делят глобальный np.random.
+    # demography - возраст, дети, рождения, информированность, переезды
+    # wages - зарплаты и начальное богатство
+    # pricing - разброс цен новых домов
+    # developer - шум в объёмах строительства
+    # ordering - порядок обхода покупателей
+
+    def __init__(self, seed=None):
+        self.seed_sequence = np.random.SeedSequence(seed)
+        for name, child in zip(STREAMS, self.seed_sequence.spawn(len(STREAMS))):
+            setattr(self, name, np.random.Generator(np.random.Philox(child)))
+        self.births = UniformBuffer(self.demography)
+
+
+class UniformBuffer:
+    # Равномерные числа из генератора блоками: агенты, которым нужно по одному числу
+    # за вызов, берут его из заранее выбранного блока вместо отдельного обращения к генератору
+
+    def __init__(self, generator, block=4096):
+        self.generator = generator
+        self.block = block
+        self.values = []
+        self.position = 0
+
+    def __call__(self):
+        if self.position == len(self.values):
+            self.values = self.generator.random(self.block).tolist()
+            self.position = 0
+        value = self.values[self.position]
+        self.position += 1
+        return value
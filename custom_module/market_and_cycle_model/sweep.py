@@ -0,0 +1,36 @@
+import itertools
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from .scenario import run_scenario
+
+
+def policy_grid(month, **values):
+    # Все комбинации значений политики, применяемых после шага month:
+    # policy_grid(162, mortgage_rate=[0.06, 0.08]) -> {"mortgage_rate=0.06": {162: {...}}, ...}
+    # Для атрибутов государства используйте government__<атрибут>
+    keys = [key.replace("__", ".") for key in values]
+    scenarios = {}
+    for combination in itertools.product(*values.values()):
+        policy = dict(zip(keys, combination))
+        name = ",".join(f"{key}={value}" for key, value in policy.items())
+        scenarios[name] = {month: policy}
+    return scenarios
+
+
+def run_sweep(scenarios, seeds, processes=None, **kwargs):
+    # Запускает каждый сценарий (имя -> события) с каждым зерном в пуле процессов.
+    # kwargs передаются в run_scenario (months, num_buyers, policy, engine, config).
+    # Возвращает одну таблицу: scenario, seed, step и все показатели модели
+    tasks = list(itertools.product(scenarios.items(), seeds))
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [
+            pool.submit(run_scenario, events, seed=seed, **kwargs)
+            for (name, events), seed in tasks]
+        results = [future.result() for future in futures]
+    frames = []
+    for ((name, events), seed), result in zip(tasks, results):
+        result = result.rename_axis("step").reset_index()
+        result.insert(0, "seed", seed)
+        result.insert(0, "scenario", name)
+        frames.append(result)
+    return pd.concat(frames, ignore_index=True)
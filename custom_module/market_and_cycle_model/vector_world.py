@@ -0,0 +1,143 @@
+import numpy as np
+from .agents import Seller, Government
+from .base_world import BaseWorldModel
+from .market import clear_market, demand
+from .population import BuyerPopulation
+
+
+class VectorWorldModel(BaseWorldModel):
+    # Тот же мир, что и WorldModel, но покупатели хранятся колонками в BuyerPopulation,
+    # а не отдельными агентами. Продавец и государство остаются агентами mesa, владельцы
+    # домов, как и в WorldModel, - в HouseStore
+    # Для StepProfiler: фазы покупателей здесь - один вызов на всё население
+    PHASE_CALLS = {"reprice_houses": "developer_houses"}
+    # Сколько следующих покупателей за раз оценивает buy_in_order
+    BUY_CHUNK = 1024
+
+    def create_buyers(self, num_buyers):
+        self.population = BuyerPopulation(self.streams, self.config)
+        self.totals = self.population.totals  # Суммы по покупателям для показателей
+        self.population.add(num_buyers, n_children=-1)
+
+    def reseed(self, seed):
+        super().reseed(seed)
+        self.population.streams = self.streams
+
+    def generate_kids(self):
+        self.population.generate_kids()
+
+    def generate_wealth(self):
+        self.population.generate_wealth()
+
+    def generate_houses(self):
+        # Как WorldModel.generate_houses: дома по кругу первым num_buyers домохозяйствам
+        if self.num_buyers == 0:
+            return
+        houses = self.developer_houses.ids()
+        owners = np.arange(len(houses)) % self.num_buyers
+        self.houses.owner[houses] = self.population.unique_id[owners]
+        for house in houses.tolist():
+            self.developer_houses.remove(house)
+        self.population.n_houses[:self.num_buyers] += np.bincount(owners, minlength=self.num_buyers)
+        self.totals.houses += len(houses)
+
+    def market_columns(self):
+        # Колонки покупателей для market.clear_market - сами массивы населения, без копий
+        return {name: getattr(self.population, name) for name in BuyerPopulation.COLUMNS}
+
+    def clear_market(self):
+        clear_market(self, self.market_columns())
+
+    def buy_in_order(self):
+        # То же, что Buyer.buy для каждого взрослого по порядку. Спрос считается по текущим ценам
+        # для следующих BUY_CHUNK агентов; до первого желающего купить цены не меняются, поэтому
+        # после покупки расчёт продолжается со следующего за купившим агента. Так фаза стоит
+        # O(взрослые + покупки * BUY_CHUNK), а не O(взрослые * покупки)
+        population = self.population
+        columns = self.market_columns()
+        self.mortgage_pricing.sync(self, self.agents_by_type[Government][0])
+        adults = np.flatnonzero(population.age >= self.config.ADOLESCENCE_AGE)
+        while len(adults) > 0:
+            if len(self.developer_houses) == 0:
+                self.buyers_want_home += len(adults)
+                return
+            chunk = adults[:self.BUY_CHUNK]
+            informed = population.is_informed[chunk]
+            prices = self.houses.price
+            price = np.where(
+                informed, prices[self.developer_houses.cheapest()], prices[self.developer_houses.oldest()])
+            buying_type, targeted_house_number, additional_consumption, selected_mortgage_rate, mortgage_duration = (
+                demand(self, columns, chunk, price))
+
+            wants = np.flatnonzero(targeted_house_number > population.n_houses[chunk])
+            last = wants[0] if len(wants) > 0 else len(chunk) - 1
+            grown = population.age[chunk[:last + 1]] > self.config.ADOLESCENCE_AGE
+            population.additional_consumption[chunk[:last + 1][grown]] = additional_consumption[:last + 1][grown]
+            if len(wants) > 0:
+                house = self.developer_houses.cheapest() if informed[last] else self.developer_houses.oldest()
+                self.purchase(
+                    chunk[last], house, buying_type[last], selected_mortgage_rate[last], mortgage_duration[last])
+            adults = adults[last + 1:]
+
+    def purchase(self, row, house, buying_type, selected_mortgage_rate, mortgage_duration):
+        population = self.population
+        price = self.houses.price[house].item()
+        government = self.agents_by_type[Government][0]
+        seller = self.agents_by_type[Seller][0]
+        if buying_type == 'mortgage':
+            selected_mortgage_rate = float(selected_mortgage_rate)
+            monthly_payment = self.mortgage_pricing.payment_factor(
+                selected_mortgage_rate, mortgage_duration) * price * 0.7
+            population.mortgage_monthly_payment[row] += monthly_payment
+            if (selected_mortgage_rate < self.mortgage_rate) or government.is_spending:
+                full_payment = self.mortgage_pricing.payment_factor(
+                    selected_mortgage_rate, mortgage_duration, government.mortgage_percent_help) * price * 0.7
+                government.money_reserve -= (full_payment - monthly_payment) * mortgage_duration
+                self.program_spending += (full_payment - monthly_payment) * mortgage_duration
+            population.wealth[row] -= price * 0.3
+            self.mortgages_bought += 1
+            self.mortgage_rates.append(selected_mortgage_rate)
+            self.mortgage_durations.append(mortgage_duration)
+        else:
+            population.wealth[row] -= price
+            self.cash_bought += 1
+        population.n_houses[row] += 1
+        self.totals.houses += 1
+        self.houses.owner[house] = population.unique_id[row]
+        seller.house_bought(price)
+        self.developer_houses.remove(house)
+
+    def count_buyers(self):
+        return len(self.population)
+
+    def change_state(self):
+        government = self.agents_by_type[Government][0]
+        self.births, self.deaths = self.population.change_state(government, self.houses)
+
+    def recieve_government_help(self):
+        # Как WorldModel.recieve_government_help, но по колонкам населения
+        population = self.population
+        government = self.agents_by_type[Government][0]
+        payments, handed, spent = government.allocate_help(
+            self.streams.ordering.permutation(len(population)), population.wealth, population.wage,
+            (population.n_houses == 0) & (population.age > self.config.ADOLESCENCE_AGE), len(government.houses))
+        population.wealth += payments
+        population.n_houses[handed] += 1
+        self.houses.owner[government.houses[:len(handed)]] = population.unique_id[handed]
+        del government.houses[:len(handed)]
+        self.totals.houses += len(handed)
+        self.transfert_spending += spent
+
+    def get_buyer_wealth(self):
+        return self.population.wealth
+
+    def get_buyer_columns(self):
+        population = self.population
+        return {
+            "unique_id": population.unique_id,
+            "age": population.age,
+            "wage": population.wage,
+            "wealth": population.wealth,
+            "n_children": population.n_children,
+            "n_houses": population.n_houses,
+        }
@@ -1,202 +1,163 @@
-import mesa
 import numpy as np
-from .agents import Buyer, Seller, Government, House
-from .settings import *
-from math import floor
-
-
-class WorldModel(mesa.Model):
-    def __init__(self, num_buyers, seed=None, mortgage_rate=STARTING_MORTGAGE_RATE):
-        super().__init__(seed=seed)
-        self.num_buyers = num_buyers
-        self.sorted_houses = None
-        self.vacant_houses = None
-        self.mortgage_rate = mortgage_rate
-        self.youth_mortgage_rate = YOUTH_MORTGAGE_RATE
-        self.family_mortgage_rate = FAMILY_MORTGAGE_RATE
-        self.mortgages_bought = 0
-        self.cash_bought = 0
-        self.deaths = 0
-        self.births = 0
-        self.program_spending = 0
-        self.transfert_spending = 0
-        self.mortgage_rates = []
-        self.mortgage_durations = []
-
-        # Создаём агентов
+from .agents import Buyer, Government
+from .aggregates import PopulationTotals
+from .base_world import BaseWorldModel
+from .lineage import LineageIndex
+from .market import clear_market
+
+
+class WorldModel(BaseWorldModel):
+    # Покупатели - агенты mesa Buyer, общая часть модели - в BaseWorldModel
+
+    def create_buyers(self, num_buyers):
+        self.newborn_parents = []
+        self.dead_buyers = []
+        self.buyers_by_id = {}  # unique_id -> Buyer для живых покупателей
+        self.lineage = LineageIndex()  # Кто чей ребёнок, для наследства
+        self.totals = PopulationTotals()  # Суммы по покупателям для показателей
         Buyer.create_agents(model=self, n=num_buyers)
-        House.create_agents(model=self, n=floor(num_buyers * STARTING_HOUSE_PER_PERSON), price=PRICE_START)
-        Seller.create_agents(model=self, n=1)
-        Government.create_agents(model=self, n=1)
-
-        # Генерируем начальные условия
-        self.agents_by_type[Buyer].do("generate_kids")
-        self.agents_by_type[Buyer].do("generate_houses")
-        self.agents_by_type[Buyer].do("generate_wealth")
-
-        # Заново генерируем резервы застройщикам, т.к. в generate_houses раздали все дома
-        House.create_agents(model=self, n=RESERVE_START, price=PRICE_START)
-
-        self.datacollector = mesa.DataCollector(
-            model_reporters={
-                "acquired_homes": compute_acquired_homes,
-                "existing_homes": compute_existing_homes,
-                "demand": store_buyers_want_home,
-                "sold_price": store_sold_price,
-                "start_price": store_start_price,
-                "reserve": store_reserve,
-                "alt_reserve": store_alternative_reserve,
-                "produce": store_product,
-                "sold": store_sold,
-                "population": compute_population,
-                "fertility": compute_fertility,
-                "average_age": compute_average_age,
-                "average_wealth": compute_average_wealth,
-                "highest_wealth": store_highest_wealth,
-                "lowest_wealth": store_lowest_wealth,
-                "cash_bought": store_cash_bought,
-                "mortgages_bought": store_mortgages_bought,
-                "births": store_births,
-                "deaths": store_deaths,
-                "hai": compute_hai,
-                "pir": compute_pir,
-                "government_reserve": store_government_reserves,
-                "taxes": store_taxes,
-                "transferts": store_transfert,
-                "program_spending": store_program_spending
-            }
-        )
-        self.buyers_want_home = 0
-    
-    def update_world(self):
-        vacant_houses = self.agents_by_type[House].select(lambda x: x.owner == 'developer')
-        self.vacant_houses = vacant_houses
-        self.sorted_houses = vacant_houses.sort(lambda x: x.price, ascending=True)
-        self.buyers_want_home = 0
-        self.mortgages_bought = 0
-        self.cash_bought = 0
-        self.deaths = 0
-        self.births = 0
-        self.transfert_spending = 0
-        self.mortgage_rates = []
-
-    def step(self):
-        self.update_world()
-        self.agents_by_type[Buyer].do("change_state")
-        self.agents_by_type[Buyer].do("recieve_government_help")
-        self.agents_by_type[Buyer].do("buy")
-        self.agents_by_type[Seller].do(
-            "product", buyers_want_home=self.buyers_want_home
-        )
-        self.agents_by_type[House].select(lambda x: x.owner == 'developer').do("add_month_without_buyer")
-        self.datacollector.collect(self)
-
-    def __str__(self):
-        return 'Current world state (settings)'
-
-
-def compute_acquired_homes(model):
-    agent_homes = [len(agent.houses) for agent in model.agents_by_type[Buyer]]
-    return sum(agent_homes)
-
-def compute_existing_homes(model):
-    return len(model.agents_by_type[House])
-
-
-def compute_population(model):
-    return len(model.agents_by_type[Buyer])
-
-
-def compute_fertility(model):
-    agent_fertility = [
-        agent.n_children for agent in model.agents_by_type[Buyer]]
-    return sum(agent_fertility)
-
-
-def compute_average_age(model):
-    agent_age = [agent.age for agent in model.agents_by_type[Buyer]]
-    return np.mean(agent_age)
-
-
-def compute_average_wealth(model):
-    agent_wealth = [agent.wealth for agent in model.agents_by_type[Buyer]]
-    return np.mean(agent_wealth)
-
-# def compute_average_desired_price(model):
-#    agent_desired_price = [agent.wealth for agent in model.agents_by_type[Buyer]]
-#    return np.mean(agent_desired_price)
-
-def compute_pir(model):
-    agent_income = model.agents_by_type[Buyer].agg('wage', np.mean) + (model.transfert_spending/len(model.agents_by_type[Buyer]))
-    price = model.agents_by_type[Seller][0].sold_price_history[-2]
-    return price / (12 * agent_income)
-
-def compute_hai(model):
-    agent_income = model.agents_by_type[Buyer].agg('wage', np.mean) + (model.transfert_spending/len(model.agents_by_type[Buyer]))
-    price = model.agents_by_type[Seller][0].sold_price_history[-2]
-    avg_mortgage_rate = np.mean(model.mortgage_rates)
-    monthly_mortgage_rate = avg_mortgage_rate/12
-    mortgage_duration_avg = np.mean(model.mortgage_durations[-50:])
-    mortgage_overpay_ratio = (
-        monthly_mortgage_rate + 
-        (monthly_mortgage_rate / ((1+monthly_mortgage_rate)**(mortgage_duration_avg) - 1))
-    ) * mortgage_duration_avg
-    return agent_income / ((1/0.35)*0.7*price*mortgage_overpay_ratio/mortgage_duration_avg)
-
-
-
-def store_buyers_want_home(model):
-    return model.buyers_want_home
-
-
-def store_sold_price(model):
-    # Здесь и далее индекс -2, потому что к моменту забора данных уже появились новые значения
-    return model.agents_by_type[Seller][0].sold_price_history[-2]
-
-def store_start_price(model):
-    return model.agents_by_type[Seller][0].start_price_history[-1]
-
-
-def store_reserve(model):
-    return model.agents_by_type[Seller][0].reserve_history[-2]
-
-def store_alternative_reserve(model):
-    return len(model.sorted_houses)
-
-
-def store_product(model):
-    return model.agents_by_type[Seller][0].produce_history[-2]
-
-def store_sold(model):
-    return model.agents_by_type[Seller][0].sold_history[-2]
-
-def store_highest_wealth(model):
-    return max(model.agents_by_type[Buyer].get('wealth'))
-
-def store_lowest_wealth(model):
-    return min(model.agents_by_type[Buyer].get('wealth'))
-
-def store_cash_bought(model):
-    return model.cash_bought
-
-def store_mortgages_bought(model):
-    return model.mortgages_bought
-
-def store_births(model):
-    return model.births
-
-def store_deaths(model):
-    return model.deaths
-
-def store_government_reserves(model):
-    return model.agents_by_type[Government][0].money_reserve
-
-def store_taxes(model):
-    return model.agents_by_type[Government][0].taxes
-
-def store_transfert(model):
-    return model.transfert_spending
 
+    def generate_kids(self):
+        # Генерируем детей при первичном прогоне одним вызовом: у детей одного родителя общий возраст
+        parents = [buyer for buyer in self.agents_by_type[Buyer] if buyer.n_children > 0]
+        counts = np.array([parent.n_children for parent in parents], dtype=int)
+        kids_age = self.streams.demography.integers(0, self.config.ADOLESCENCE_AGE, size=len(parents))
+        kids = Buyer.create_agents(model=self, n=counts.sum(), age=np.repeat(kids_age, counts), n_children=0)
+        self.lineage.add(np.repeat([parent.unique_id for parent in parents], counts), [kid.unique_id for kid in kids])
+
+    def generate_wealth(self):
+        # Генерируем накопленное богатство при первичном прогоне одним вызовом
+        buyers = self.agents_by_type[Buyer]
+        wealth = self.streams.wages.random(len(buyers)) * self.config.WEALTH_MULTIPLIER - self.config.WEALTH_DIMINISHER
+        for buyer, value in zip(buyers, wealth.tolist()):
+            buyer.wealth = value
+
+    def create_newborns(self):
+        # Дети, родившиеся за шаг, создаются одним вызовом
+        kids = Buyer.create_agents(model=self, n=len(self.newborn_parents), age=0, n_children=0)
+        self.lineage.add([parent.unique_id for parent in self.newborn_parents], [kid.unique_id for kid in kids])
+        self.newborn_parents = []
+
+    def settle_estates(self):
+        # Наследство всех умерших за шаг делится разом.
+        # Деньги делятся на всех когда-либо рождённых детей (n_children), а дома раздаются
+        # живым детям по порядку рождения: первые houses % n_children получают на один дом больше.
+        # Наследство бездетных уходит государству одним вызовом
+        dead = self.dead_buyers
+        self.dead_buyers = []
+        if not dead:
+            return
+        dead_ids = [buyer.unique_id for buyer in dead]
+        # Дома всех умерших - один запрос к HouseStore: дома dead[i] - houses[offsets[i]:offsets[i + 1]]
+        houses, offsets = self.houses.houses_of(dead_ids)
+        heirless = [i for i, buyer in enumerate(dead) if buyer.n_children == 0]
+        if heirless:
+            self.agents_by_type[Government][0].get_lost_inheritance(
+                houses=np.concatenate([houses[offsets[i]:offsets[i + 1]] for i in heirless]),
+                wealth=sum(dead[i].wealth for i in heirless))
+
+        heirs, estates, ranks = self.lineage.children_of(dead_ids)
+        position = {unique_id: i for i, unique_id in enumerate(dead_ids)}
+        for heir, estate, rank in zip(heirs.tolist(), estates.tolist(), ranks.tolist()):
+            parent = dead[position[estate]]
+            share, extra = divmod(parent.n_houses, parent.n_children)
+            start = offsets[position[estate]] + rank * share + min(rank, extra)
+            self.buyers_by_id[heir].recieve_inheritance(
+                money=parent.wealth / parent.n_children,
+                houses=houses[start:start + share + (rank < extra)])
+
+        self.lineage.discard(dead_ids)
+        self.totals.remove(
+            wage=np.fromiter((buyer.wage for buyer in dead), dtype=float, count=len(dead)),
+            age=np.fromiter((buyer.age for buyer in dead), dtype=np.int64, count=len(dead)),
+            children=np.fromiter((buyer.n_children for buyer in dead), dtype=np.int64, count=len(dead)),
+            houses=np.fromiter((buyer.n_houses for buyer in dead), dtype=np.int64, count=len(dead)))
+        for buyer in dead:
+            del self.buyers_by_id[buyer.unique_id]
+            buyer.remove()
+
+    def generate_houses(self):
+        # Генерируем дома при первичном прогоне одним проходом: дома застройщика по порядку
+        # постройки раздаются по кругу первым num_buyers покупателям (без детей).
+        # При STARTING_HOUSE_PER_PERSON > 1 каждый получает по несколько домов
+        buyers = list(self.agents_by_type[Buyer])[:self.num_buyers]
+        if len(buyers) == 0:
+            return
+        self.totals.houses += len(self.developer_houses)
+        for i, house in enumerate(self.developer_houses):
+            buyer = buyers[i % len(buyers)]
+            buyer.n_houses += 1
+            self.houses.owner[house] = buyer.unique_id
+            self.developer_houses.remove(house)
+
+    def count_buyers(self):
+        return len(self.agents_by_type[Buyer])
+
+    def change_state(self):
+        buyers = self.agents_by_type[Buyer]
+        buyers.do("change_state")
+        # Все, кроме умерших, стали на месяц старше
+        self.totals.children += self.births
+        self.totals.age += len(buyers) - len(self.dead_buyers)
+        self.settle_estates()
+        self.create_newborns()
+
+    def recieve_government_help(self):
+        # Государство раздаёт помощь всем покупателям разом в случайном порядке
+        government = self.agents_by_type[Government][0]
+        buyers = list(self.agents_by_type[Buyer])
+        adolescence_age = self.config.ADOLESCENCE_AGE
+        wealth = np.fromiter((buyer.wealth for buyer in buyers), dtype=float, count=len(buyers))
+        wage = np.fromiter((buyer.wage for buyer in buyers), dtype=float, count=len(buyers))
+        homeless = np.fromiter(
+            (buyer.n_houses == 0 and buyer.age > adolescence_age for buyer in buyers), dtype=bool, count=len(buyers))
+        payments, handed, spent = government.allocate_help(
+            self.streams.ordering.permutation(len(buyers)), wealth, wage, homeless, len(government.houses))
+        for row in np.flatnonzero(payments):
+            buyers[row].wealth += payments[row].item()
+        for row, house in zip(handed, government.houses[:len(handed)]):
+            buyers[row].n_houses += 1
+            self.houses.owner[house] = buyers[row].unique_id
+        del government.houses[:len(handed)]
+        self.totals.houses += len(handed)
+        self.transfert_spending += spent
+
+    def buy_in_order(self):
+        self.mortgage_pricing.sync(self, self.agents_by_type[Government][0])
+        self.agents_by_type[Buyer].do("buy")
 
-def store_program_spending(model):
-    return model.program_spending
+    def clear_market(self):
+        # market.clear_market по колонкам агентов, изменения записываются обратно в агентов
+        buyers = list(self.agents_by_type[Buyer])
+        columns = {
+            name: np.array([getattr(buyer, name) for buyer in buyers], dtype=dtype)
+            for name, dtype in (("unique_id", np.int64), ("age", np.int64), ("wage", float), ("wealth", float),
+                                ("n_children", np.int64), ("n_houses", np.int64), ("mortgage_monthly_payment", float),
+                                ("additional_consumption", float), ("is_informed", bool))}
+        for row in clear_market(self, columns).tolist():
+            buyer = buyers[row]
+            buyer.wealth = columns["wealth"][row].item()
+            buyer.n_houses = columns["n_houses"][row].item()
+            buyer.mortgage_monthly_payment = columns["mortgage_monthly_payment"][row].item()
+            buyer.additional_consumption = columns["additional_consumption"][row].item()
+
+    def get_buyer_wealth(self):
+        buyers = self.agents_by_type[Buyer]
+        return np.fromiter((buyer.wealth for buyer in buyers), dtype=float, count=len(buyers))
+
+    def get_buyer_columns(self):
+        # Характеристики всех покупателей колонками за один проход по агентам
+        buyers = self.agents_by_type[Buyer]
+        rows = [
+            (buyer.unique_id, buyer.age, buyer.wage, buyer.wealth, buyer.n_children, buyer.n_houses)
+            for buyer in buyers]
+        unique_id, age, wage, wealth, n_children, n_houses = (
+            np.array(column) for column in (list(zip(*rows)) or [()] * 6))
+        return {
+            "unique_id": unique_id,
+            "age": age,
+            "wage": wage,
+            "wealth": wealth,
+            "n_children": n_children,
+            "n_houses": n_houses,
+        }